@@ -0,0 +1,29 @@
+#!/bin/bash
+####################################################
+################### Relay script ###################
+####################################################
+# This is an alternative bash script that reads the
+# stream ($1, the first argument) from a local
+# youtube4tvh relay (youtube4tvh/relay.py) instead
+# of fetching it directly. The relay keeps a single
+# upstream (streamlink.sh, by default) per channel,
+# so several TVH subscriptions or recordings of the
+# same channel share one download.
+#
+# To use it, start the relay (python relay.py) and
+# change the '--pipecmd' from
+# 'pipe:///bin/bash /opt/youtube4tvh/streamlink.sh'
+# to 'pipe:///bin/bash /opt/youtube4tvh/relay.sh'.
+#
+# The relay address is $YOUTUBE4TVH_RELAY or, by
+# default, http://127.0.0.1:9110.
+#
+####################################################
+#### Add/modify script according to your needs #####
+curl \
+--silent \
+--fail \
+--no-buffer \
+--get \
+--data-urlencode "url=$1" \
+"${YOUTUBE4TVH_RELAY:-http://127.0.0.1:9110}/stream"
@@ -9,15 +9,34 @@
 # to reduce the chance of buffering. Everything else
 # follows default values.
 #
+# If youtube4tvh was run with '--manifestcache', the
+# HLS manifest of the stream is read from that cache
+# instead of resolving the Youtube URL at tune time,
+# which makes channel switching faster. The cache dir
+# is $YOUTUBE4TVH_MANIFEST_CACHE or, by default,
+# /opt/youtube4tvh/cache/manifests. A missing entry
+# or one that expires in less than 5 minutes falls
+# back to resolving the URL with streamlink.
+#
 # Inspired by niwi_niwi's post at
 # https://tvheadend.org/boards/5/topics/35658
 #
 # More info: https://streamlink.github.io/cli.html
 #
 ####################################################
+CACHE_DIR="${YOUTUBE4TVH_MANIFEST_CACHE:-/opt/youtube4tvh/cache/manifests}"
+STREAM="$1"
+VIDEO_ID="${1##*v=}"
+VIDEO_ID="${VIDEO_ID%%&*}"
+if [[ "$VIDEO_ID" =~ ^[A-Za-z0-9_-]+$ ]] && [ -r "$CACHE_DIR/$VIDEO_ID" ]; then
+  read -r EXPIRE MANIFEST < "$CACHE_DIR/$VIDEO_ID"
+  if [[ "$EXPIRE" =~ ^[0-9]+$ ]] && [ "$EXPIRE" -gt $(( $(date +%s) + 300 )) ]; then
+    STREAM="hls://$MANIFEST"
+  fi
+fi
 #### Add/modify script according to your needs #####
 streamlink \
 --stdout \
 --hls-segment-threads 4 \
 --hls-live-edge 10 \
-"$1" best
+"$STREAM" best
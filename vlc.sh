@@ -20,6 +20,10 @@
 # stream ($1, the first argument) to stdout.
 # Everything else follows default values.
 #
+# Like streamlink.sh, the HLS manifest is read from
+# the youtube4tvh manifest cache when it has a valid
+# entry for the stream (see '--manifestcache').
+#
 # To transcode the stream before piping into
 # TVH, add 'transcode{OPTIONS}' to '--sout'.
 #
@@ -27,9 +31,19 @@
 # Last tested with: VLC v3.0.11 Vetinari
 #
 ###################################################
+CACHE_DIR="${YOUTUBE4TVH_MANIFEST_CACHE:-/opt/youtube4tvh/cache/manifests}"
+STREAM="$1"
+VIDEO_ID="${1##*v=}"
+VIDEO_ID="${VIDEO_ID%%&*}"
+if [[ "$VIDEO_ID" =~ ^[A-Za-z0-9_-]+$ ]] && [ -r "$CACHE_DIR/$VIDEO_ID" ]; then
+  read -r EXPIRE MANIFEST < "$CACHE_DIR/$VIDEO_ID"
+  if [[ "$EXPIRE" =~ ^[0-9]+$ ]] && [ "$EXPIRE" -gt $(( $(date +%s) + 300 )) ]; then
+    STREAM="$MANIFEST"
+  fi
+fi
 #### Add/modify script according to your needs ####
 vlc \
 -I dummy \
 --quiet \
 --sout "#:std{access=file,mux=ts,dst=-}" \
-"$1"
+"$STREAM"
@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+# Purpose:      Benchmark the M3U handler of Youtube4TVH
+# Author:       cgomesu
+# Disclaimer:   Use at your own discretion.
+#               The author does not provide any sort warranty whatsoever.
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+
+
+# Modules that must not be imported by main.py before a mode actually needs them
+HEAVY_MODULES = ['pandas', 'numpy', 'requests']
+
+
+def cli():
+    ap = ArgumentParser()
+    ap.add_argument('--bench',
+                    choices=['parse', 'startup'],
+                    type=str,
+                    default='parse',
+                    required=False,
+                    help='benchmark to run. '
+                         'bench=parse reports the parse time of a large m3u playlist by number of processes (default). '
+                         'bench=startup checks the CLI startup time against --budget and fails if it regresses.')
+    ap.add_argument('--budget',
+                    type=float,
+                    default=50,
+                    required=False,
+                    help='for --bench=startup. the maximum startup overhead of \'main.py --help\' over a bare '
+                         'interpreter, in milliseconds. default is 50.')
+    ap.add_argument('--entries',
+                    type=int,
+                    default=200000,
+                    required=False,
+                    help='for --bench=parse. number of channels in the synthetic m3u playlist. default is 200000.')
+    ap.add_argument('--repeat',
+                    type=int,
+                    default=3,
+                    required=False,
+                    help='number of runs of each benchmark. the best run is reported. default is 3.')
+    return vars(ap.parse_args())
+
+
+def synthetic_m3u(path, entries):
+    # Write a playlist with the given number of entries to path
+    with open(path, 'w') as f:
+        f.write('#EXTM3U\n')
+        for i in range(entries):
+            f.write('#EXTINF:-1 tvg-id="UC{0:022d}" tvg-name="Channel {0}" tvg-language="English" '
+                    'tvg-country="US" tvg-logo="https://yt3.ggpht.com/logo{0}.jpg" tvg-url="" '
+                    'group-title="News",Channel {0}\n'
+                    'pipe:///bin/bash /opt/youtube4tvh/streamlink.sh '
+                    'https://www.youtube.com/watch?v={0:011d}\n'.format(i))
+
+
+def best_of(repeat, func, *args, **kwargs):
+    # Return the shortest wall time (in seconds) of repeat calls to func
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_parse():
+    # Parse time of a large playlist by number of processes
+    from lib.m3uhandler import M3uHandler
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.m3u')
+        synthetic_m3u(path, args_cli['entries'])
+        m3u = M3uHandler(path, None)
+        print('[INFO] Parsing {} entries ({:.1f} MiB)...'.format(args_cli['entries'],
+                                                                 os.path.getsize(path) / 1024 ** 2))
+        processes, baseline = 1, None
+        while processes <= (os.cpu_count() or 1):
+            elapsed = best_of(args_cli['repeat'], m3u.parse, processes=processes)
+            baseline = baseline or elapsed
+            print('processes={:<3} {:8.3f}s  speedup={:.2f}x'.format(processes, elapsed, baseline / elapsed))
+            processes *= 2
+
+
+def bench_startup():
+    # Startup overhead of the CLI over a bare interpreter. Exits with an error on regression.
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def run(*cmd):
+        subprocess.check_call([sys.executable] + list(cmd), cwd=here, stdout=subprocess.DEVNULL)
+    baseline = best_of(args_cli['repeat'], run, '-c', 'pass')
+    startup = best_of(args_cli['repeat'], run, 'main.py', '--help')
+    overhead = (startup - baseline) * 1000
+    print('interpreter={:.1f}ms  main.py --help={:.1f}ms  overhead={:.1f}ms  budget={:.1f}ms'.format(
+        baseline * 1000, startup * 1000, overhead, args_cli['budget']))
+    loaded = subprocess.check_output(
+        [sys.executable, '-c', 'import sys, main; print(" ".join(m for m in {} if m in sys.modules))'.format(
+            HEAVY_MODULES)],
+        cwd=here, universal_newlines=True).split()
+    if loaded:
+        print('[WARNING] main.py imports heavy modules at startup: {}'.format(', '.join(loaded)))
+    if overhead > args_cli['budget']:
+        print('[WARNING] The startup overhead is over budget.')
+    if loaded or overhead > args_cli['budget']:
+        exit(1)
+    print('[INFO] The startup time is within budget.')
+
+
+def main():
+    print('##############################################')
+    print('[INFO] Running Youtube4TVH \'{}\' benchmark.'.format(args_cli['bench']))
+    print('##############################################')
+    bench_parse() if args_cli['bench'] == 'parse' else bench_startup()
+
+
+if __name__ == '__main__':
+    args_cli = cli()
+    main()
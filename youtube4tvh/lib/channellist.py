@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+# Purpose:      Save a Youtube live-stream to an M3U playlist
+# Author:       cgomesu
+# Disclaimer:   Use at your own discretion.
+#               The author does not provide any sort warranty whatsoever.
+
+import csv
+import json
+import os
+
+
+# Fields of a channel in a channel list. Only the name is required.
+FIELDS = ['name', 'id', 'logo', 'group']
+
+
+def read_channels(path):
+    """
+    Reads a list of channels from a CSV (with a header), JSON or YAML file.
+    JSON and YAML files contain a list of channels or a mapping with a 'channels' list.
+    YAML requires the PyYAML package.
+    :return: list of channels as dictionaries with the FIELDS keys OR None
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        with open(path, 'r') as f:
+            if extension == '.csv':
+                data = list(csv.DictReader(f))
+            elif extension == '.json':
+                data = json.load(f)
+            elif extension in ['.yaml', '.yml']:
+                try:
+                    import yaml
+                except ImportError:
+                    raise Exception('the PyYAML package is required to read YAML files (pip install pyyaml)')
+                data = yaml.safe_load(f)
+            else:
+                raise Exception('unknown file extension \'{}\'. use .csv, .json, .yaml or .yml'.format(extension))
+        if isinstance(data, dict):
+            data = data.get('channels', [])
+        channels = []
+        for item in data:
+            channel = {field: str(item.get(field) or '').strip() for field in FIELDS}
+            if not channel['name']:
+                print('Skipping a channel without a name: {}'.format(item))
+                continue
+            channels.append(channel)
+        if not channels:
+            raise Exception('there are no channels in the list')
+        print('Read {} channel(s) from {}.'.format(len(channels), path))
+        return channels
+    except Exception as err:
+        print('There was an error reading the channel list: {}'.format(err))
+        return None
@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+# Purpose:      Save a Youtube live-stream to an M3U playlist
+# Author:       cgomesu
+# Disclaimer:   Use at your own discretion.
+#               Be mindful of the API daily quota.
+#               The author does not provide any sort warranty whatsoever.
+
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+
+def quota_day():
+    # Youtube API quotas reset at midnight Pacific Time
+    try:
+        from zoneinfo import ZoneInfo
+        now = datetime.datetime.now(ZoneInfo('America/Los_Angeles'))
+    except Exception:
+        now = datetime.datetime.utcnow() - datetime.timedelta(hours=8)
+    return now.strftime('%Y-%m-%d')
+
+
+class KeyPool:
+    """
+    A pool of Youtube API keys that spreads requests across keys by remaining daily quota.
+    Exhausted and invalid keys are taken out of rotation until the next daily reset.
+    If a statefile is provided, the usage of each key is kept there across runs.
+    Keys are identified in the statefile by a hash, so the keys themselves are not saved.
+    """
+    # reasons of API errors that take a key out of rotation
+    exhausted_reasons = ['quotaExceeded', 'dailyLimitExceeded']
+    invalid_reasons = ['keyInvalid', 'keyExpired', 'accessNotConfigured']
+
+    def __init__(self, apikeys, statefile=None, quota=10000):
+        self.apikeys = [key for key in apikeys if key]
+        self.statefile = statefile
+        self.quota = quota
+        self.lock = threading.Lock()
+        self.day = quota_day()
+        self.state = {}
+        try:
+            with open(self.statefile, 'r') as f:
+                saved = json.load(f)
+            if saved.get('day') == self.day:
+                self.state = saved.get('keys', {})
+        except (IOError, OSError, TypeError, ValueError):
+            pass
+        for key in self.apikeys:
+            self.state.setdefault(self.keyid(key), {'used': 0, 'status': 'ok'})
+
+    @staticmethod
+    def keyid(key):
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:12]
+
+    def reset(self):
+        # Start a new quota day, if the daily reset happened since the last call
+        day = quota_day()
+        if day != self.day:
+            self.day = day
+            self.state = {self.keyid(key): {'used': 0, 'status': 'ok'} for key in self.apikeys}
+
+    def acquire(self, cost):
+        """
+        Reserves cost quota units on the key with the most remaining quota
+        :return: key OR None if no key has enough quota left
+        """
+        with self.lock:
+            self.reset()
+            available = [key for key in self.apikeys
+                         if self.state[self.keyid(key)]['status'] == 'ok'
+                         and self.quota - self.state[self.keyid(key)]['used'] >= cost]
+            if not available:
+                return None
+            key = max(available, key=lambda k: self.quota - self.state[self.keyid(k)]['used'])
+            self.state[self.keyid(key)]['used'] += cost
+            return key
+
+    def release(self, key, cost):
+        # Give back the cost reserved by acquire() for a request that the API did not accept
+        with self.lock:
+            state = self.state[self.keyid(key)]
+            state['used'] = max(0, state['used'] - cost)
+
+    def retire(self, key, reason):
+        # Take a key out of rotation because of an API error reason. Returns True if it was retired.
+        if reason in self.exhausted_reasons:
+            status = 'exhausted'
+        elif reason in self.invalid_reasons:
+            status = 'invalid'
+        else:
+            return False
+        with self.lock:
+            self.state[self.keyid(key)]['status'] = status
+        print('The Youtube API key {} is {} ({}). Taking it out of rotation.'.format(self.keyid(key), status, reason))
+        self.save()
+        return True
+
+    def remaining(self):
+        with self.lock:
+            return sum(max(0, self.quota - self.state[self.keyid(key)]['used'])
+                       for key in self.apikeys if self.state[self.keyid(key)]['status'] == 'ok')
+
+    def save(self):
+        # Atomically write the usage of the keys to the statefile
+        if not self.statefile:
+            return
+        try:
+            with self.lock:
+                with open(self.statefile + '.tmp', 'w') as f:
+                    json.dump({'day': self.day, 'keys': self.state}, f, indent=1, sort_keys=True)
+                os.replace(self.statefile + '.tmp', self.statefile)
+        except Exception as err:
+            print('There was an error saving the state of the API keys: {}'.format(err))
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+# Purpose:      Save a Youtube live-stream to an M3U playlist
+# Author:       cgomesu
+# Disclaimer:   Use at your own discretion.
+#               The author does not provide any sort warranty whatsoever.
+
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import threading
+import requests
+
+
+class LogoCache:
+    """
+    A content-addressed local cache of channel logos.
+    Logos are stored by the sha256 of their content, so channels with the same logo share a file,
+    and are only revalidated (ETag/If-Modified-Since) when their channel is refreshed.
+    """
+    def __init__(self, cachedir, baseurl=None, size=None, timeout=(10, 30)):
+        self.cachedir = cachedir
+        # if provided, logos are served from baseurl (e.g., a web server on cachedir) instead of the local path
+        self.baseurl = baseurl
+        # if provided, logos are downscaled to fit in a size x size box (requires Pillow)
+        self.size = size
+        # (connect, read) timeouts of every request, in seconds
+        self.timeout = timeout
+        self.index_path = os.path.join(cachedir, 'index.json')
+        self.index = {}
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        try:
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+        except (IOError, OSError, ValueError):
+            pass
+
+    def location(self, filename):
+        if self.baseurl:
+            return '{}/{}'.format(self.baseurl.rstrip('/'), filename)
+        return os.path.abspath(os.path.join(self.cachedir, filename))
+
+    def cached(self, url):
+        # Return the location of the cached logo at url without revalidating it OR url if it is not cached
+        with self.lock:
+            entry = self.index.get(url)
+        if entry and os.path.isfile(os.path.join(self.cachedir, entry['file'])):
+            return self.location(entry['file'])
+        return url
+
+    def fetch(self, url, timeout=None):
+        """
+        Downloads or revalidates the logo at url
+        :param timeout: (connect, read) timeouts of this request, in seconds. default is self.timeout.
+        :return: the local path (or URL) of the cached logo OR url if it could not be cached
+        """
+        if not url or not url.startswith(('https://', 'http://')):
+            return url
+        with self.lock:
+            entry = dict(self.index.get(url, {}))
+        if entry and not os.path.isfile(os.path.join(self.cachedir, entry['file'])):
+            entry = {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            req = self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+            if req.status_code == 304 and entry:
+                print('The cached logo {} is still valid.'.format(entry['file']))
+                return self.location(entry['file'])
+            if req.status_code != 200:
+                raise requests.HTTPError('bad HTTP code {}'.format(req.status_code))
+            content, content_type = req.content, req.headers.get('Content-Type', '').split(';')[0]
+            if self.size:
+                content, content_type = self.downscale(content, content_type)
+            filename = hashlib.sha256(content).hexdigest() + (mimetypes.guess_extension(content_type) or '.jpg')
+            path = os.path.join(self.cachedir, filename)
+            if not os.path.isfile(path):
+                os.makedirs(self.cachedir, exist_ok=True)
+                # channels that share a logo may write it concurrently, so each thread has its own tmp file
+                tmp = '{}.{}.tmp'.format(path, threading.get_ident())
+                with open(tmp, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp, path)
+            entry = {
+                'file': filename,
+                'etag': req.headers.get('ETag', ''),
+                'last_modified': req.headers.get('Last-Modified', ''),
+            }
+            with self.lock:
+                self.index[url] = entry
+            print('The logo was saved to the cache as {}.'.format(filename))
+            return self.location(filename)
+        except Exception as err:
+            print('There was an error caching the logo {}: {}'.format(url, err))
+            # keep serving a previously cached logo, if any
+            return self.location(entry['file']) if entry else url
+
+    def downscale(self, content, content_type):
+        # Downscale a logo to fit in a size x size box as a PNG. Returns the original logo without Pillow.
+        try:
+            from PIL import Image
+        except ImportError:
+            print('The Pillow package is required to downscale logos (pip install pillow).')
+            return content, content_type
+        image = Image.open(io.BytesIO(content))
+        image.thumbnail((self.size, self.size))
+        output = io.BytesIO()
+        image.save(output, format='PNG')
+        return output.getvalue(), 'image/png'
+
+    def save(self):
+        # Atomically write the index of cached logos
+        try:
+            os.makedirs(self.cachedir, exist_ok=True)
+            with self.lock:
+                with open(self.index_path + '.tmp', 'w') as f:
+                    json.dump(self.index, f, indent=1, sort_keys=True)
+            os.replace(self.index_path + '.tmp', self.index_path)
+        except Exception as err:
+            print('There was an error saving the index of the logo cache: {}'.format(err))
@@ -6,76 +6,152 @@
 #               Be mindful of the API daily quota.
 #               The author does not provide any sort warranty whatsoever.
 
+import os
 import re
 import pandas
+from itertools import chain, islice
+
+
+# Regex dictionary for iptv m3u files, compiled once at import
+rx_dict = {
+    'bad_header': re.compile(
+        r"^\#(?!EXTM3U|EXTINF).*",
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    ),
+    'channel_content': re.compile(
+        r"^(?P<channel_content>\#EXTINF:.*$\n.*$)",
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    ),
+    'channel_name': re.compile(
+        r"\,(?P<channel_name>.*$)",
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    ),
+    'channel_duration': re.compile(
+        r"\#EXTINF:(?P<channel_duration>0|-1)",
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    ),
+    'extinf_tvg_id': re.compile(
+        r"tvg-id=\"(?P<extinf_tvg_id>.*?)\"",
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    ),
+    'extinf_tvg_name': re.compile(
+        r"tvg-name=\"(?P<extinf_tvg_name>.*?)\"",
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    ),
+    'extinf_tvg_language': re.compile(
+        r"tvg-language=\"(?P<extinf_tvg_language>.*?)\"",
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    ),
+    'extinf_tvg_country': re.compile(
+        r"tvg-country=\"(?P<extinf_tvg_country>.*?)\"",
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    ),
+    'extinf_tvg_logo': re.compile(
+        r"tvg-logo=\"(?P<extinf_tvg_logo>.*?)\"",
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    ),
+    'extinf_tvg_url': re.compile(
+        r"tvg-url=\"(?P<extinf_tvg_url>.*?)\"",
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    ),
+    'extinf_group_title': re.compile(
+        r"group-title=\"(?P<extinf_group_title>.*?)\"",
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    ),
+    'stream_url': re.compile(
+        r"^(?P<stream_url>(?!\#).*$)",
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    )
+}
+
+
+def parse_content(content):
+    # Parse the channels of an m3u content into a list of records, in order
+    return [
+        (channel_content.group('channel_content'),
+         channel_name.group('channel_name'),
+         channel_duration.group('channel_duration'),
+         tvg_id.group('extinf_tvg_id'),
+         tvg_name.group('extinf_tvg_name'),
+         tvg_language.group('extinf_tvg_language'),
+         tvg_country.group('extinf_tvg_country'),
+         tvg_logo.group('extinf_tvg_logo'),
+         tvg_url.group('extinf_tvg_url'),
+         group_title.group('extinf_group_title'),
+         stream_url.group('stream_url'))
+        for channel_content in
+        rx_dict['channel_content'].finditer(content)
+        for channel_name in
+        rx_dict['channel_name'].finditer(channel_content.group('channel_content'))
+        for channel_duration in
+        rx_dict['channel_duration'].finditer(channel_content.group('channel_content'))
+        for tvg_id in
+        rx_dict['extinf_tvg_id'].finditer(channel_content.group('channel_content'))
+        for tvg_name in
+        rx_dict['extinf_tvg_name'].finditer(channel_content.group('channel_content'))
+        for tvg_language in
+        rx_dict['extinf_tvg_language'].finditer(channel_content.group('channel_content'))
+        for tvg_country in
+        rx_dict['extinf_tvg_country'].finditer(channel_content.group('channel_content'))
+        for tvg_logo in
+        rx_dict['extinf_tvg_logo'].finditer(channel_content.group('channel_content'))
+        for tvg_url in
+        rx_dict['extinf_tvg_url'].finditer(channel_content.group('channel_content'))
+        for group_title in
+        rx_dict['extinf_group_title'].finditer(channel_content.group('channel_content'))
+        for stream_url in
+        rx_dict['stream_url'].finditer(channel_content.group('channel_content'))
+    ]
+
+
+def split_content(content, chunks):
+    # Split an m3u content into at most chunks pieces at #EXTINF boundaries
+    size = len(content) // chunks + 1
+    pieces, start = [], 0
+    while start < len(content):
+        end = content.find('\n#EXTINF', start + size)
+        end = len(content) if end < 0 else end + 1
+        pieces.append(content[start:end])
+        start = end
+    return pieces
 
 
 class M3uHandler:
+    # Column labels of an m3u data frame
+    columns = ['channel-content',
+               'channel-name',
+               'channel-duration',
+               'tvg-id',
+               'tvg-name',
+               'tvg-language',
+               'tvg-country',
+               'tvg-logo',
+               'tvg-url',
+               'group-title',
+               'stream-url']
+    # Size (in characters) above which parse() switches to a pool of processes (8 MiB)
+    parallel_threshold = 8 * 1024 * 1024
+    # Size of the write buffer of .m3u files (1 MiB)
+    buffersize = 1024 * 1024
+
     def __init__(self, m3uinput, m3uoutput):
         self.m3uinput = m3uinput
         self.m3uoutput = m3uoutput
 
-    def parse(self):
-        # Define regex dictionary for iptv m3u files
-        rx_dict = {
-            'bad_header': re.compile(
-                r"^\#(?!EXTM3U|EXTINF).*",
-                re.IGNORECASE | re.MULTILINE | re.VERBOSE
-            ),
-            'channel_content': re.compile(
-                r"^(?P<channel_content>\#EXTINF:.*$\n.*$)",
-                re.IGNORECASE | re.MULTILINE | re.VERBOSE
-            ),
-            'channel_name': re.compile(
-                r"\,(?P<channel_name>.*$)",
-                re.IGNORECASE | re.MULTILINE | re.VERBOSE
-            ),
-            'channel_duration': re.compile(
-                r"\#EXTINF:(?P<channel_duration>0|-1)",
-                re.IGNORECASE | re.MULTILINE | re.VERBOSE
-            ),
-            'extinf_tvg_id': re.compile(
-                r"tvg-id=\"(?P<extinf_tvg_id>.*?)\"",
-                re.IGNORECASE | re.MULTILINE | re.VERBOSE
-            ),
-            'extinf_tvg_name': re.compile(
-                r"tvg-name=\"(?P<extinf_tvg_name>.*?)\"",
-                re.IGNORECASE | re.MULTILINE | re.VERBOSE
-            ),
-            'extinf_tvg_language': re.compile(
-                r"tvg-language=\"(?P<extinf_tvg_language>.*?)\"",
-                re.IGNORECASE | re.MULTILINE | re.VERBOSE
-            ),
-            'extinf_tvg_country': re.compile(
-                r"tvg-country=\"(?P<extinf_tvg_country>.*?)\"",
-                re.IGNORECASE | re.MULTILINE | re.VERBOSE
-            ),
-            'extinf_tvg_logo': re.compile(
-                r"tvg-logo=\"(?P<extinf_tvg_logo>.*?)\"",
-                re.IGNORECASE | re.MULTILINE | re.VERBOSE
-            ),
-            'extinf_tvg_url': re.compile(
-                r"tvg-url=\"(?P<extinf_tvg_url>.*?)\"",
-                re.IGNORECASE | re.MULTILINE | re.VERBOSE
-            ),
-            'extinf_group_title': re.compile(
-                r"group-title=\"(?P<extinf_group_title>.*?)\"",
-                re.IGNORECASE | re.MULTILINE | re.VERBOSE
-            ),
-            'stream_url': re.compile(
-                r"^(?P<stream_url>(?!\#).*$)",
-                re.IGNORECASE | re.MULTILINE | re.VERBOSE
-            )
-        }
+    def parse(self, processes=None):
+        # Parse the m3u file into a data frame.
+        # Files larger than parallel_threshold are split at #EXTINF boundaries and parsed in a
+        # pool of processes (one per cpu by default). Set processes to force a pool size.
         try:
             print("Validating the m3u file...")
             with open(self.m3uinput, 'r') as f:
-                if rx_dict['bad_header'].search(f.read()) is not None:
-                    print("The PARSER is unable to VALIDATE the m3u file {} because it has \n"
-                          "at least one #HEADER different than #EXTM3U or #EXTINF. Remove the \n"
-                          "bad header(s) to allow the program to parse your m3u file.".format(self.m3uinput))
-                    raise Exception
-                print("Did not find bad headers in the m3u file {}.".format(self.m3uinput))
+                content = f.read()
+            if rx_dict['bad_header'].search(content) is not None:
+                print("The PARSER is unable to VALIDATE the m3u file {} because it has \n"
+                      "at least one #HEADER different than #EXTM3U or #EXTINF. Remove the \n"
+                      "bad header(s) to allow the program to parse your m3u file.".format(self.m3uinput))
+                raise Exception
+            print("Did not find bad headers in the m3u file {}.".format(self.m3uinput))
         except Exception as err:
             print("There was an error VALIDATING the m3u file: {}".format(err))
             print("Will continue but data frame is None.")
@@ -83,104 +159,63 @@ class M3uHandler:
         # Writes m3u file to a data frame
         try:
             print("Parsing the m3u file...")
-            with open(self.m3uinput, 'r') as f:
-                parsed_data = (
-                    (channel_content.group('channel_content'),
-                     channel_name.group('channel_name'),
-                     channel_duration.group('channel_duration'),
-                     tvg_id.group('extinf_tvg_id'),
-                     tvg_name.group('extinf_tvg_name'),
-                     tvg_language.group('extinf_tvg_language'),
-                     tvg_country.group('extinf_tvg_country'),
-                     tvg_logo.group('extinf_tvg_logo'),
-                     tvg_url.group('extinf_tvg_url'),
-                     group_title.group('extinf_group_title'),
-                     stream_url.group('stream_url'))
-                    for channel_content in
-                    rx_dict['channel_content'].finditer(f.read())
-                    for channel_name in
-                    rx_dict['channel_name'].finditer(channel_content.group('channel_content'))
-                    for channel_duration in
-                    rx_dict['channel_duration'].finditer(channel_content.group('channel_content'))
-                    for tvg_id in
-                    rx_dict['extinf_tvg_id'].finditer(channel_content.group('channel_content'))
-                    for tvg_name in
-                    rx_dict['extinf_tvg_name'].finditer(channel_content.group('channel_content'))
-                    for tvg_language in
-                    rx_dict['extinf_tvg_language'].finditer(channel_content.group('channel_content'))
-                    for tvg_country in
-                    rx_dict['extinf_tvg_country'].finditer(channel_content.group('channel_content'))
-                    for tvg_logo in
-                    rx_dict['extinf_tvg_logo'].finditer(channel_content.group('channel_content'))
-                    for tvg_url in
-                    rx_dict['extinf_tvg_url'].finditer(channel_content.group('channel_content'))
-                    for group_title in
-                    rx_dict['extinf_group_title'].finditer(channel_content.group('channel_content'))
-                    for stream_url in
-                    rx_dict['stream_url'].finditer(channel_content.group('channel_content'))
-                )
-                df = pandas.DataFrame(parsed_data, columns=['channel-content',
-                                                            'channel-name',
-                                                            'channel-duration',
-                                                            'tvg-id',
-                                                            'tvg-name',
-                                                            'tvg-language',
-                                                            'tvg-country',
-                                                            'tvg-logo',
-                                                            'tvg-url',
-                                                            'group-title',
-                                                            'stream-url'])
-                if df.empty:
-                    print("The data frame is empty after parsing the m3u file!")
-                    raise Exception
-                print("The m3u file was successfully parsed!")
-                return df
+            if processes is None:
+                processes = (os.cpu_count() or 1) if len(content) >= M3uHandler.parallel_threshold else 1
+            if processes > 1:
+                print("Parsing in parallel with {} processes...".format(processes))
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=processes) as executor:
+                    chunks = executor.map(parse_content, split_content(content, processes * 4))
+                    parsed_data = list(chain.from_iterable(chunks))
+            else:
+                parsed_data = parse_content(content)
+            df = pandas.DataFrame(parsed_data, columns=M3uHandler.columns)
+            if df.empty:
+                print("The data frame is empty after parsing the m3u file!")
+                raise Exception
+            print("The m3u file was successfully parsed!")
+            return df
         except Exception as err:
             print("There was an error parsing the m3u file: {}".format(err))
             print("Will continue but data frame is None.")
             return None
 
-    def write(self, dataframe):
-        # Consolidate a m3u data frame to a .m3u file
+    def write(self, dataframe, chunksize=10000):
+        # Consolidate a m3u data frame to a .m3u file.
+        # Entries are formatted column-wise and written in chunks of chunksize rows.
+        # Returns True if the file was written.
         try:
-            with open(self.m3uoutput, "w") as f:
+            with open(self.m3uoutput, "w", buffering=M3uHandler.buffersize) as f:
                 f.write("#EXTM3U\n")
-                for row in dataframe.itertuples(index=False):
-                    channel_data = {
-                        'channel-duration': row[dataframe.columns.get_loc("channel-duration")],
-                        'tvg-id': row[dataframe.columns.get_loc("tvg-id")],
-                        'tvg-name': row[dataframe.columns.get_loc("tvg-name")],
-                        'tvg-language': row[dataframe.columns.get_loc("tvg-language")],
-                        'tvg-country': row[dataframe.columns.get_loc("tvg-country")],
-                        'tvg-logo': row[dataframe.columns.get_loc("tvg-logo")],
-                        'tvg-url': row[dataframe.columns.get_loc("tvg-url")],
-                        'group-title': row[dataframe.columns.get_loc("group-title")],
-                        'channel-name': row[dataframe.columns.get_loc("channel-name")],
-                        'stream-url': row[dataframe.columns.get_loc("stream-url")]
-                    }
-                    str_channel_data = str("#EXTINF:{} "
-                                           "tvg-id=\"{}\" "
-                                           "tvg-name=\"{}\" "
-                                           "tvg-language=\"{}\" "
-                                           "tvg-country=\"{}\" "
-                                           "tvg-logo=\"{}\" "
-                                           "tvg-url=\"{}\" "
-                                           "group-title=\"{}\","
-                                           "{}\n"
-                                           "{}\n").format(channel_data["channel-duration"],
-                                                          channel_data["tvg-id"],
-                                                          channel_data["tvg-name"],
-                                                          channel_data["tvg-language"],
-                                                          channel_data["tvg-country"],
-                                                          channel_data["tvg-logo"],
-                                                          channel_data["tvg-url"],
-                                                          channel_data["group-title"],
-                                                          channel_data["channel-name"],
-                                                          channel_data["stream-url"])
-                    f.write(str_channel_data)
+                for start in range(0, len(dataframe), chunksize):
+                    content = M3uHandler.content(dataframe.iloc[start:start + chunksize])
+                    f.write("\n".join(content) + "\n")
                 print("Data frame was successfully exported to {}!".format(self.m3uoutput))
+            return True
         except Exception as err:
             print("There was an error writing the data frame to the m3u file. Error: {}".format(err))
+            return False
+
+    def write_stream(self, entries, chunksize=10000):
+        # Write an iterable of entries to a .m3u file without building a data frame first.
+        # Each entry is a dictionary keyed on the m3u column labels (missing keys are empty).
+        # Returns True if the file was written.
+        try:
+            with open(self.m3uoutput, "w", buffering=M3uHandler.buffersize) as f:
+                f.write("#EXTM3U\n")
+                entries = iter(entries)
+                while True:
+                    chunk = list(islice(entries, chunksize))
+                    if not chunk:
+                        break
+                    # entries are formatted by content(), as in write()
+                    content = M3uHandler.content(pandas.DataFrame(chunk, columns=M3uHandler.columns))
+                    f.write("\n".join(content) + "\n")
+                print("Entries were successfully exported to {}!".format(self.m3uoutput))
+            return True
+        except Exception as err:
+            print("There was an error writing the entries to the m3u file. Error: {}".format(err))
+            return False
 
     @staticmethod
     def append(dataframe,
@@ -191,49 +226,102 @@ class M3uHandler:
                pipecmd,
                url):
         # Append stream data to the data frame
-        channelcontent = "#EXTINF:-1 " \
-                         "tvg-id=\"{}\" " \
-                         "tvg-name=\"{}\" " \
-                         "tvg-language=\"\" " \
-                         "tvg-country=\"{}\" " \
-                         "tvg-logo=\"{}\" " \
-                         "tvg-url=\"\" " \
-                         "group-title=\"\"," \
-                         "{}\n" \
-                         "{} {}".format(channelid,
-                                                  channelname,
-                                                  channelcountry,
-                                                  channellogo,
-                                                  channelname,
-                                                  pipecmd,
-                                                  url)
-        data = {
-            "channel-content": channelcontent,
-            "channel-name": channelname,
-            "channel-duration": "-1",
-            "tvg-id": channelid,
-            "tvg-name": channelname,
-            "tvg-language": "",
-            "tvg-country": channelcountry,
-            "tvg-logo": channellogo,
-            "tvg-url": "",
-            "group-title": "",
-            "stream-url": "{} {}".format(pipecmd, url)
+        channel = {
+            'channelid': channelid,
+            'channelname': channelname,
+            'channelcountry': channelcountry,
+            'channellogo': channellogo,
+            'pipecmd': pipecmd,
+            'url': url
         }
         try:
-            df = dataframe.append(data, ignore_index=True)
+            df = pandas.concat([dataframe, M3uHandler.frame([channel])], ignore_index=True)
             print("Stream info successfully appended to the data frame!")
             return df
         except Exception as err:
             print("There was an error APPENDING data to the data frame. Error: {}".format(err))
             return None
 
+    @staticmethod
+    def content(dataframe):
+        # Build the '#EXTINF' + stream url content of every row column-wise
+        cols = {name: dataframe[name].fillna('').astype(str) for name in M3uHandler.columns}
+        return ("#EXTINF:" + cols['channel-duration'] +
+                " tvg-id=\"" + cols['tvg-id'] +
+                "\" tvg-name=\"" + cols['tvg-name'] +
+                "\" tvg-language=\"" + cols['tvg-language'] +
+                "\" tvg-country=\"" + cols['tvg-country'] +
+                "\" tvg-logo=\"" + cols['tvg-logo'] +
+                "\" tvg-url=\"" + cols['tvg-url'] +
+                "\" group-title=\"" + cols['group-title'] +
+                "\"," + cols['channel-name'] +
+                "\n" + cols['stream-url'])
+
+    @staticmethod
+    def frame(channels):
+        # Create a data frame from a batch of resolved channels, each a dictionary with
+        # the same keys as the arguments of append() and update() and an optional channelgroup
+        df = pandas.DataFrame([{
+            "channel-name": channel['channelname'],
+            "channel-duration": "-1",
+            "tvg-id": channel['channelid'],
+            "tvg-name": channel['channelname'],
+            "tvg-language": "",
+            "tvg-country": channel['channelcountry'],
+            "tvg-logo": channel['channellogo'],
+            "tvg-url": "",
+            "group-title": channel.get('channelgroup', ''),
+            "stream-url": "{} {}".format(channel['pipecmd'], channel['url'])
+        } for channel in channels], columns=M3uHandler.columns)
+        df["channel-content"] = M3uHandler.content(df)
+        return df
+
+    @staticmethod
+    def merge(dataframe, channels, append_new=True):
+        # Update and append a batch of resolved channels in a single step, keyed on tvg-id.
+        # Existing non-empty tvg-name, tvg-country and group-title win over the new info, as in update(),
+        # tvg-logo is replaced by a new non-empty logo and stream-url is always replaced.
+        # Returns the merged data frame OR None.
+        try:
+            batch = M3uHandler.frame(channels).drop_duplicates(subset="tvg-id", keep="last")
+            found = dataframe["tvg-id"].isin(batch["tvg-id"])
+            df = dataframe.copy()
+            if found.any():
+                matched = batch.set_index("tvg-id").reindex(df.loc[found, "tvg-id"])
+                matched.index = df.index[found]
+                for column in ["tvg-name", "tvg-country", "group-title"]:
+                    current = df.loc[found, column]
+                    df.loc[found, column] = current.where(current.fillna('').astype(bool), matched[column])
+                logo = matched["tvg-logo"]
+                df.loc[found, "tvg-logo"] = logo.where(logo.fillna('').astype(bool), df.loc[found, "tvg-logo"])
+                df.loc[found, "stream-url"] = matched["stream-url"]
+                df.loc[found, "channel-content"] = M3uHandler.content(df.loc[found])
+            if append_new:
+                new = batch.loc[~batch["tvg-id"].isin(dataframe["tvg-id"])]
+                if not new.empty:
+                    df = pandas.concat([df, new], ignore_index=True)
+            print("Merged {} channel(s) into the data frame: {} updated, {} appended.".format(
+                len(batch), int(found.sum()), len(df) - len(dataframe)))
+            return df
+        except Exception as err:
+            print("There was an error MERGING channels into the data frame. Error: {}".format(err))
+            return None
+
+    @staticmethod
+    def changes(old, new):
+        # Return the channels in both data frames whose stream url changed, keyed on tvg-id,
+        # as a data frame with channel-name, stream-url-old and stream-url-new columns
+        merged = old[["tvg-id", "stream-url"]].drop_duplicates(subset="tvg-id").merge(
+            new[["tvg-id", "channel-name", "stream-url"]].drop_duplicates(subset="tvg-id"),
+            on="tvg-id", suffixes=("-old", "-new"))
+        return merged.loc[merged["stream-url-old"] != merged["stream-url-new"]]
+
     @staticmethod
     def extract_column(dataframe, column_name):
         # Extract content from a data frame column that matches the column_name
         try:
             content_list = []
-            for name, content in dataframe.iteritems():
+            for name, content in dataframe.items():
                 if name == column_name:
                     # Save match to a list
                     content_list = content.values.tolist()
@@ -253,20 +341,7 @@ class M3uHandler:
     @staticmethod
     def template():
         # Create a template data frame with m3u column labels
-        data = {
-            "channel-content": [],
-            "channel-name": [],
-            "channel-duration": [],
-            "tvg-id": [],
-            "tvg-name": [],
-            "tvg-language": [],
-            "tvg-country": [],
-            "tvg-logo": [],
-            "tvg-url": [],
-            "group-title": [],
-            "stream-url": []
-        }
-        df = pandas.DataFrame(data)
+        df = pandas.DataFrame(columns=M3uHandler.columns)
         print("Empty data frame created.")
         return df
 
@@ -279,60 +354,16 @@ class M3uHandler:
                pipecmd,
                url):
         # Search and update a channel's info in the data frame
-        try:
-            # Find index that contains the channel ID under tvg-id
-            target_index = dataframe.loc[dataframe["tvg-id"] == channelid].index
-
-            # Do not overwrite existing info from the m3u file, except for the stream url
-            if dataframe.at[target_index[0], "tvg-name"]:
-                channelname = dataframe.at[target_index[0], "tvg-name"]
-            if dataframe.at[target_index[0], "tvg-country"]:
-                channelcountry = dataframe.at[target_index[0], "tvg-country"]
-            channellang = dataframe.at[target_index[0], "tvg-language"]
-            channelepgurl = dataframe.at[target_index[0], "tvg-url"]
-            channelgroup = dataframe.at[target_index[0], "group-title"]
-
-            # Update individual cells from that row
-            channelcontent = "#EXTINF:-1 " \
-                             "tvg-id=\"{}\" " \
-                             "tvg-name=\"{}\" " \
-                             "tvg-language=\"{}\" " \
-                             "tvg-country=\"{}\" " \
-                             "tvg-logo=\"{}\" " \
-                             "tvg-url=\"{}\" " \
-                             "group-title=\"{}\"," \
-                             "{}\n" \
-                             "{} {}".format(channelid,
-                                                      channelname,
-                                                      channellang,
-                                                      channelcountry,
-                                                      channellogo,
-                                                      channelepgurl,
-                                                      channelgroup,
-                                                      channelname,
-                                                      pipecmd,
-                                                      url)
-            data = {
-                "channel-content": channelcontent,
-                "channel-name": channelname,
-                "channel-duration": "-1",
-                "tvg-id": channelid,
-                "tvg-name": channelname,
-                "tvg-language": channellang,
-                "tvg-country": channelcountry,
-                "tvg-logo": channellogo,
-                "tvg-url": channelepgurl,
-                "group-title": channelgroup,
-                "stream-url": "{} {}".format(pipecmd, url)
-            }
-            dataframe.at[target_index[0], "tvg-name"] = data["channel-name"]
-            dataframe.at[target_index[0], "tvg-language"] = data["tvg-language"]
-            dataframe.at[target_index[0], "tvg-country"] = data["tvg-country"]
-            dataframe.at[target_index[0], "tvg-logo"] = data["tvg-logo"]
-            dataframe.at[target_index[0], "tvg-url"] = data["tvg-url"]
-            dataframe.at[target_index[0], "group-title"] = data["group-title"]
-            dataframe.at[target_index[0], "stream-url"] = data["stream-url"]
-            return dataframe
-        except Exception as err:
-            print("There was an error UPDATING the data frame. Error: {}".format(err))
+        channel = {
+            'channelid': channelid,
+            'channelname': channelname,
+            'channelcountry': channelcountry,
+            'channellogo': channellogo,
+            'pipecmd': pipecmd,
+            'url': url
+        }
+        df = M3uHandler.merge(dataframe, [channel], append_new=False)
+        if df is None:
+            print("There was an error UPDATING the data frame.")
             return dataframe
+        return df
@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+# Purpose:      Save a Youtube live-stream to an M3U playlist
+# Author:       cgomesu
+# Disclaimer:   Use at your own discretion.
+#               The author does not provide any sort warranty whatsoever.
+
+import os
+import re
+import time
+
+
+class ManifestCache:
+    """
+    A directory of pre-resolved HLS manifests, one file per video id, read by the pipe scripts
+    (streamlink.sh, vlc.sh) at tune time. Each file has a single line with the expiration time
+    (unix time) and the URL of the manifest, separated by a space.
+    """
+    # video ids are also file names, so nothing else is accepted
+    regex_videoid = re.compile(r'^[A-Za-z0-9_-]+$')
+
+    def __init__(self, cachedir):
+        self.cachedir = cachedir
+
+    def path(self, videoid):
+        if not self.regex_videoid.match(videoid):
+            raise ValueError('invalid video id \'{}\''.format(videoid))
+        return os.path.join(self.cachedir, videoid)
+
+    def get(self, videoid):
+        """
+        Returns the cached manifest of a video id if it has not expired
+        :return: manifest as a dictionary with url and expire OR None
+        """
+        try:
+            with open(self.path(videoid), 'r') as f:
+                expire, url = f.read().split()
+            if int(expire) <= time.time():
+                return None
+            return {'url': url, 'expire': int(expire)}
+        except (IOError, OSError, ValueError):
+            return None
+
+    def save(self, videoid, manifest):
+        # Atomically replace the cached manifest of a video id, so readers never see a partial file
+        try:
+            os.makedirs(self.cachedir, exist_ok=True)
+            path = self.path(videoid)
+            with open(path + '.tmp', 'w') as f:
+                f.write('{} {}\n'.format(manifest['expire'], manifest['url']))
+            os.replace(path + '.tmp', path)
+            print('The HLS manifest of \'{}\' was saved to the cache.'.format(videoid))
+        except Exception as err:
+            print('There was an error saving the HLS manifest to the cache: {}'.format(err))
+
+    def prune(self):
+        # Remove expired manifests from the cache
+        if not os.path.isdir(self.cachedir):
+            return
+        for videoid in os.listdir(self.cachedir):
+            if self.regex_videoid.match(videoid) and self.get(videoid) is None:
+                try:
+                    os.remove(os.path.join(self.cachedir, videoid))
+                except OSError:
+                    pass
@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+# Purpose:      Save a Youtube live-stream to an M3U playlist
+# Author:       cgomesu
+# Disclaimer:   Use at your own discretion.
+#               The author does not provide any sort warranty whatsoever.
+
+import sqlite3
+import time
+
+
+class Registry:
+    """
+    A SQLite registry of channels, indexed on tvg-id and channel name, that is the source of truth
+    of the m3u playlists generated from it. It also keeps per-channel state between runs:
+    last resolved time, last video id, consecutive failures and total API quota cost.
+    """
+    # m3u column labels kept in the registry, in playlist order
+    columns = ['channel-name',
+               'channel-duration',
+               'tvg-id',
+               'tvg-name',
+               'tvg-language',
+               'tvg-country',
+               'tvg-logo',
+               'tvg-url',
+               'group-title',
+               'stream-url']
+    schema = '''
+        CREATE TABLE IF NOT EXISTS channels (
+            id INTEGER PRIMARY KEY,
+            tvg_id TEXT NOT NULL DEFAULT '',
+            channel_name TEXT NOT NULL DEFAULT '',
+            channel_duration TEXT NOT NULL DEFAULT '-1',
+            tvg_name TEXT NOT NULL DEFAULT '',
+            tvg_language TEXT NOT NULL DEFAULT '',
+            tvg_country TEXT NOT NULL DEFAULT '',
+            tvg_logo TEXT NOT NULL DEFAULT '',
+            tvg_url TEXT NOT NULL DEFAULT '',
+            group_title TEXT NOT NULL DEFAULT '',
+            stream_url TEXT NOT NULL DEFAULT '',
+            last_resolved REAL,
+            last_videoid TEXT,
+            failures INTEGER NOT NULL DEFAULT 0,
+            quota_cost INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS channels_tvg_id ON channels (tvg_id);
+        CREATE INDEX IF NOT EXISTS channels_name ON channels (channel_name);
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.executescript(self.schema)
+
+    @staticmethod
+    def field(column):
+        # SQL field of an m3u column label
+        return column.replace('-', '_')
+
+    def count(self):
+        return self.connection.execute('SELECT COUNT(*) FROM channels').fetchone()[0]
+
+    def names(self):
+        # Channel names, in playlist order
+        return [row[0] for row in self.connection.execute('SELECT channel_name FROM channels ORDER BY rowid')]
+
+    def import_dataframe(self, dataframe):
+        # Seed the registry from an m3u data frame. Every entry is kept, even with an empty or repeated tvg-id.
+        fields = [self.field(column) for column in self.columns]
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO channels ({}) VALUES ({})'.format(', '.join(fields),
+                                                                 ', '.join('?' * len(fields))),
+                dataframe[self.columns].fillna('').astype(str).itertuples(index=False, name=None))
+        print('The registry has {} channel(s) after importing the data frame.'.format(self.count()))
+
+    def save(self, streams, append_new=True):
+        """
+        Updates and (if append_new) inserts resolved channels in a single transaction, keyed on tvg-id.
+        As in M3uHandler.merge(), existing non-empty tvg-name, tvg-country and group-title win
+        and tvg-logo is only replaced by a new non-empty logo.
+        :param streams: list of resolved channels, as in M3uHandler.merge()
+        :return: list of (channel name, old url, new url) of channels whose stream url changed
+        """
+        now = time.time()
+        changes = []
+        with self.connection:
+            for stream in streams:
+                url = '{} {}'.format(stream['pipecmd'], stream['url'])
+                rows = self.connection.execute('SELECT channel_name, stream_url FROM channels WHERE tvg_id = ?',
+                                               (stream['channelid'],)).fetchall()
+                if not rows and not append_new:
+                    continue
+                changes.extend((row['channel_name'], row['stream_url'], url)
+                               for row in rows if row['stream_url'] != url)
+                parameters = {
+                    'id': stream['channelid'],
+                    'name': stream['channelname'],
+                    'country': stream['channelcountry'] or '',
+                    'logo': stream['channellogo'] or '',
+                    'group': stream.get('channelgroup', ''),
+                    'url': url,
+                    'now': now,
+                    'videoid': stream.get('videoid'),
+                    'cost': stream.get('quotacost', 0),
+                }
+                if not rows:
+                    self.connection.execute('''
+                        INSERT INTO channels (tvg_id, channel_name, tvg_name, tvg_country, tvg_logo, group_title,
+                                              stream_url, last_resolved, last_videoid, failures, quota_cost)
+                        VALUES (:id, :name, :name, :country, :logo, :group, :url, :now, :videoid, 0, :cost)
+                    ''', parameters)
+                    continue
+                # as in M3uHandler.merge(), every entry with this tvg-id is updated
+                self.connection.execute('''
+                    UPDATE channels SET
+                        tvg_name = CASE WHEN tvg_name != '' THEN tvg_name ELSE :name END,
+                        tvg_country = CASE WHEN tvg_country != '' THEN tvg_country ELSE :country END,
+                        group_title = CASE WHEN group_title != '' THEN group_title ELSE :group END,
+                        tvg_logo = CASE WHEN :logo != '' THEN :logo ELSE tvg_logo END,
+                        stream_url = :url,
+                        last_resolved = :now,
+                        last_videoid = :videoid,
+                        failures = 0,
+                        quota_cost = quota_cost + :cost
+                    WHERE tvg_id = :id
+                ''', parameters)
+        print('Saved {} channel(s) to the registry.'.format(len(streams)))
+        return changes
+
+    def record_failures(self, names):
+        # Count a failure to resolve each of these channels
+        with self.connection:
+            self.connection.executemany('UPDATE channels SET failures = failures + 1 WHERE channel_name = ?',
+                                        [(name,) for name in names])
+
+    def entries(self, group=None):
+        """
+        Yields the channels of the registry (or of a group-title) as m3u entries, in playlist order
+        :return: dictionaries keyed on m3u column labels, as in M3uHandler.write_stream()
+        """
+        query = 'SELECT {} FROM channels'.format(', '.join(self.field(column) for column in self.columns))
+        parameters = ()
+        if group is not None:
+            query += ' WHERE group_title = ?'
+            parameters = (group,)
+        for row in self.connection.execute(query + ' ORDER BY rowid', parameters):
+            yield dict(zip(self.columns, row))
+
+    def close(self):
+        self.connection.close()
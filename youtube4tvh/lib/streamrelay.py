@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+# Purpose:      Save a Youtube live-stream to an M3U playlist
+# Author:       cgomesu
+# Disclaimer:   Use at your own discretion.
+#               The author does not provide any sort warranty whatsoever.
+
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+
+
+class Upstream:
+    """
+    A single upstream fetch of a stream (e.g., streamlink.sh URL) whose MPEG-TS output
+    is kept in a bounded ring buffer of chunks and fanned out to any number of subscribers.
+    Subscribers that fall behind the ring buffer skip ahead to the oldest chunk available.
+    """
+    # MPEG-TS packets are 188 bytes long, so chunks are kept aligned to them
+    ts_packet = 188
+
+    def __init__(self, cmd, buffersize, chunksize, prebuffer):
+        self.cmd = cmd
+        self.chunksize = max(1, chunksize // self.ts_packet) * self.ts_packet
+        self.prebuffer = prebuffer
+        self.buffer = deque(maxlen=buffersize)
+        # sequence number of the next chunk appended to the buffer
+        self.seq = 0
+        self.subscribers = 0
+        self.done = False
+        self.idle_since = time.time()
+        self.condition = threading.Condition()
+        self.process = None
+
+    def start(self):
+        print('Starting upstream: {}'.format(' '.join(self.cmd)))
+        # in its own session, so that stop() also reaches the children of a pipe script
+        self.process = subprocess.Popen(self.cmd, stdout=subprocess.PIPE, start_new_session=True)
+        reader = threading.Thread(target=self.read)
+        reader.daemon = True
+        reader.start()
+
+    def read(self):
+        # Move the output of the upstream process into the ring buffer
+        partial = b''
+        try:
+            while True:
+                # read1() returns whatever is available (up to chunksize) instead of waiting for a full chunk
+                data = self.process.stdout.read1(self.chunksize)
+                if not data:
+                    break
+                # a trailing partial packet is kept for the next chunk, so subscribers always join on a packet
+                data = partial + data
+                end = len(data) - len(data) % self.ts_packet
+                chunk, partial = data[:end], data[end:]
+                if chunk:
+                    self.append(chunk)
+            if partial:
+                self.append(partial)
+        finally:
+            with self.condition:
+                self.done = True
+                self.condition.notify_all()
+            print('Upstream ended: {}'.format(' '.join(self.cmd)))
+
+    def append(self, chunk):
+        with self.condition:
+            self.buffer.append(chunk)
+            self.seq += 1
+            self.condition.notify_all()
+
+    def subscribe(self):
+        """
+        Registers a new subscriber, starting a few chunks (prebuffer) behind the live edge
+        :return: Subscription with the stream data of the subscriber
+        """
+        with self.condition:
+            self.subscribers += 1
+            self.idle_since = None
+            position = max(self.seq - len(self.buffer), self.seq - self.prebuffer)
+        return Subscription(self, position)
+
+    def unsubscribe(self):
+        with self.condition:
+            self.subscribers -= 1
+            if not self.subscribers:
+                self.idle_since = time.time()
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            print('Stopping upstream: {}'.format(' '.join(self.cmd)))
+            os.killpg(self.process.pid, signal.SIGTERM)
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+
+
+class Subscription:
+    """
+    The stream data of a subscriber of an Upstream. It is registered when created, so the upstream
+    is not reaped before it is iterated, and must be closed when the subscriber goes away.
+    """
+    def __init__(self, upstream, position):
+        self.upstream = upstream
+        self.position = position
+        self.closed = False
+
+    def __iter__(self):
+        upstream = self.upstream
+        while True:
+            with upstream.condition:
+                while self.position >= upstream.seq and not upstream.done:
+                    upstream.condition.wait(1)
+                if self.position >= upstream.seq:
+                    return
+                oldest = upstream.seq - len(upstream.buffer)
+                self.position = max(self.position, oldest)
+                data = b''.join([upstream.buffer[i] for i in range(self.position - oldest, len(upstream.buffer))])
+                self.position = upstream.seq
+            yield data
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.upstream.unsubscribe()
+
+
+class StreamRelay:
+    """
+    Keeps at most one upstream per stream URL, shared by all of its subscribers.
+    Upstreams without subscribers are torn down after a grace period.
+    """
+    def __init__(self, upstreamcmd, buffersize=256, chunksize=65536, prebuffer=16, grace=30):
+        self.upstreamcmd = shlex.split(upstreamcmd)
+        self.buffersize = buffersize
+        self.chunksize = chunksize
+        self.prebuffer = prebuffer
+        self.grace = grace
+        self.upstreams = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, url):
+        # Return a Subscription to url for a new subscriber, starting its upstream if needed
+        with self.lock:
+            upstream = self.upstreams.get(url)
+            if upstream is None or upstream.done:
+                upstream = Upstream(self.upstreamcmd + [url], self.buffersize, self.chunksize, self.prebuffer)
+                upstream.start()
+                self.upstreams[url] = upstream
+            return upstream.subscribe()
+
+    def reap(self):
+        # Tear down upstreams that ended or have been idle for longer than the grace period
+        reaped = []
+        with self.lock:
+            for url, upstream in list(self.upstreams.items()):
+                idle = upstream.idle_since is not None and time.time() - upstream.idle_since >= self.grace
+                if upstream.done or (not upstream.subscribers and idle):
+                    reaped.append(self.upstreams.pop(url))
+        # stopping an upstream may take a while, so it does not hold up new subscribers
+        for upstream in reaped:
+            upstream.stop()
+
+    def run_reaper(self, interval=1):
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.reap()
+        reaper = threading.Thread(target=loop)
+        reaper.daemon = True
+        reaper.start()
+
+    def stop(self):
+        with self.lock:
+            upstreams = list(self.upstreams.values())
+            self.upstreams.clear()
+        for upstream in upstreams:
+            upstream.stop()
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+# Purpose:      Save a Youtube live-stream to an M3U playlist
+# Author:       cgomesu
+# Disclaimer:   Use at your own discretion.
+#               The author does not provide any sort warranty whatsoever.
+
+import json
+import requests
+from requests.auth import HTTPDigestAuth
+
+
+class TvhHandler:
+    """
+    A class for updating the IPTV muxes of a TVHeadend server through its HTTP API.
+    Only the muxes whose stream URL changed are updated, so TVH does not have to rescan the whole playlist.
+    """
+    def __init__(self, tvhurl, username=None, password=None, network=None, timeout=(10, 30)):
+        self.tvhurl = tvhurl.rstrip('/')
+        # if provided, only muxes from the IPTV network with this name are updated
+        self.network = network
+        # (connect, read) timeouts of every request, in seconds
+        self.timeout = timeout
+        self.session = requests.Session()
+        if username:
+            self.session.auth = HTTPDigestAuth(username, password or '')
+
+    def muxes(self):
+        """
+        Retrieves the IPTV muxes of the server
+        :return: list of muxes as dictionaries (uuid, iptv_url, iptv_muxname, network, ...)
+        """
+        req = self.session.get('{}/api/mpegts/mux/grid'.format(self.tvhurl),
+                               params={'start': 0, 'limit': 999999},
+                               timeout=self.timeout)
+        if req.status_code != 200:
+            raise requests.HTTPError('bad HTTP code {} while listing muxes'.format(req.status_code))
+        return [mux for mux in req.json().get('entries', [])
+                if 'iptv_url' in mux and (not self.network or mux.get('network') == self.network)]
+
+    def update_urls(self, changes):
+        """
+        Updates the URL of the muxes of changed channels, matched by their old URL or else,
+        only within a network, by their name. Names shared by more than one mux are not matched.
+        :param changes: list of (channel name, old url, new url)
+        :return: number of muxes updated OR None
+        """
+        try:
+            muxes = self.muxes()
+            by_url = {mux['iptv_url']: mux for mux in muxes}
+            by_name = {}
+            if self.network:
+                for mux in muxes:
+                    by_name.setdefault(mux.get('iptv_muxname'), []).append(mux)
+            nodes = []
+            for name, old_url, new_url in changes:
+                mux = by_url.get(old_url)
+                if not mux and len(by_name.get(name, [])) > 1:
+                    print('Found more than one mux named \'{}\' in TVH. Will not update them.'.format(name))
+                    continue
+                if not mux and by_name.get(name):
+                    mux = by_name[name][0]
+                if not mux:
+                    print('Did not find a mux for channel \'{}\' in TVH.'.format(name))
+                    continue
+                nodes.append({'uuid': mux['uuid'], 'iptv_url': new_url})
+            if nodes:
+                req = self.session.post('{}/api/idnode/save'.format(self.tvhurl),
+                                        data={'node': json.dumps(nodes)},
+                                        timeout=self.timeout)
+                if req.status_code != 200:
+                    raise requests.HTTPError('bad HTTP code {} while saving muxes'.format(req.status_code))
+            print('Updated the URL of {} mux(es) in TVH.'.format(len(nodes)))
+            return len(nodes)
+        except Exception as err:
+            print('There was an error updating the muxes in TVH: {}'.format(err))
+            return None
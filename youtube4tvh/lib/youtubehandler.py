@@ -8,7 +8,9 @@
 
 import json
 import re
+import time
 import requests
+from lib.keypool import KeyPool
 
 
 class YoutubeHandlerNoAPI:
@@ -20,9 +22,11 @@ class YoutubeHandlerNoAPI:
     regex_dict = {
         'json_content': re.compile(r'(?P<json_data>\{\"responseContext\".+\})\;', re.IGNORECASE | re.MULTILINE),
         'viewer_digits': re.compile(r'\d*'),
+        'hls_manifest': re.compile(r'\"hlsManifestUrl\":(?P<hls_manifest>\"[^\"]+\")'),
+        'hls_expire': re.compile(r'/expire/(?P<hls_expire>\d+)/'),
     }
 
-    def __init__(self, channelid, channelname, channellogo):
+    def __init__(self, channelid, channelname, channellogo, timeout=(10, 30)):
         self.channelname = channelname
         self.channelid = channelid
         self.channellogo = channellogo
@@ -38,9 +42,12 @@ class YoutubeHandlerNoAPI:
             'subfolder_channel': '/channel/',
             'resource_search': 'results',
             'resource_videos': 'videos',
+            'resource_watch': 'watch',
         }
         # https://requests.readthedocs.io/en/latest/user/advanced/#session-objects
         self.session = requests.Session()
+        # (connect, read) timeouts of every request, in seconds
+        self.timeout = timeout
 
     def find_chinfo(self):
         """
@@ -60,7 +67,8 @@ class YoutubeHandlerNoAPI:
                                                                 self.req_url['subfolder_search'],
                                                                 self.req_url['resource_search']),
                                    headers=self.req_headers,
-                                   params=parameters)
+                                   params=parameters,
+                                   timeout=self.timeout)
             print('URL: {}'.format(req.url))
             print('Status code: {}'.format(req.status_code))
             if req.status_code is not 200:
@@ -126,7 +134,8 @@ class YoutubeHandlerNoAPI:
                                                                  self.channelid + '/',
                                                                  self.req_url['resource_videos']),
                                    headers=self.req_headers,
-                                   params=parameters)
+                                   params=parameters,
+                                   timeout=self.timeout)
             print('URL: {}'.format(req.url))
             print('Status code: {}'.format(req.status_code))
             if req.status_code is not 200:
@@ -200,23 +209,123 @@ class YoutubeHandlerNoAPI:
             print('There was an error while trying to retrieve the videoId from the live-stream: {}'.format(err))
             return None
 
+    def find_manifest(self, videoid):
+        """
+        Retrieves the HLS manifest of a live-stream and its expiration time from the watch page
+        :return: manifest as a dictionary with url and expire (unix time) OR None
+        """
+        print('Requesting the HLS manifest of video id \'{}\'...'.format(videoid))
+        try:
+            req = self.session.get(url='{}://{}.{}{}{}'.format(self.req_url['protocol'],
+                                                                self.req_url['subdomain'],
+                                                                self.req_url['domain'],
+                                                                self.req_url['subfolder_search'],
+                                                                self.req_url['resource_watch']),
+                                   headers=self.req_headers,
+                                   params={'v': videoid},
+                                   timeout=self.timeout)
+            if req.status_code != 200:
+                raise requests.HTTPError
+        except requests.ConnectionError as err:
+            print('There was a network problem: {}'.format(err))
+            return None
+        except requests.Timeout:
+            print('The connection timed-out.')
+            return None
+        except requests.HTTPError:
+            print('The URL returned a bad HTTP code (not 200). Check the URL.')
+            return None
+        try:
+            find_manifest = re.search(self.regex_dict['hls_manifest'], req.text)
+            if not find_manifest:
+                raise Exception('Unable to find the HLS manifest in the watch page.')
+            # the url is a json string with escaped characters
+            manifest_url = json.loads(find_manifest.group('hls_manifest'))
+            find_expire = re.search(self.regex_dict['hls_expire'], manifest_url)
+            if not find_expire:
+                raise Exception('Unable to find the expiration time of the HLS manifest.')
+            manifest = {
+                'url': manifest_url,
+                'expire': int(find_expire.group('hls_expire')),
+            }
+            print('The HLS manifest expires at {} (unix time).'.format(manifest['expire']))
+            return manifest
+        except Exception as err:
+            print('There was an error while parsing the HLS manifest: {}'.format(err))
+            return None
+
 
 class YoutubeHandlerAPI:
     """
     A class for extracting info from Youtube using its official API v3.
     A valid API key is required and there are quota limits.
+    The apikey is either a single key or a KeyPool shared by many handlers.
     """
+    # quota cost of each resource (see https://developers.google.com/youtube/v3/determine_quota_cost)
+    quota_cost = {
+        'search': 100,
+    }
+
     def __init__(self,
                  apiurl,
                  apikey,
                  channelid,
                  channelname,
-                 channellogo):
+                 channellogo,
+                 timeout=(10, 30),
+                 deadline=None):
         self.apiurl = apiurl
-        self.apikey = apikey
+        self.keypool = apikey if isinstance(apikey, KeyPool) else KeyPool([apikey])
         self.channelid = channelid
         self.channelname = channelname
         self.channellogo = channellogo
+        # (connect, read) timeouts of every request, in seconds
+        self.timeout = timeout
+        # if provided, the time (unix) by which every request of this handler must be done
+        self.deadline = deadline
+        # quota units used by this handler
+        self.quota_used = 0
+
+    def request_timeout(self):
+        # The (connect, read) timeouts of the next request, cut short to the time left before the deadline
+        if self.deadline is None:
+            return self.timeout
+        left = self.deadline - time.time()
+        if left <= 0:
+            raise Exception('ran out of time')
+        return min(self.timeout[0], left), min(self.timeout[1], left)
+
+    def request(self, resource, parameters):
+        """
+        Requests an API resource with the next key from the pool.
+        Keys that are exhausted or invalid are taken out of rotation and the request is retried,
+        as long as there is time left before the deadline.
+        :return: response with status code 200
+        """
+        cost = self.quota_cost.get(resource, 1)
+        while True:
+            timeout = self.request_timeout()
+            apikey = self.keypool.acquire(cost)
+            if not apikey:
+                raise Exception('all Youtube API keys are exhausted or invalid')
+            # only requests accepted by the API count towards the quota used
+            try:
+                response = requests.get(self.apiurl + resource, params=dict(parameters, key=apikey),
+                                        timeout=timeout)
+            except Exception:
+                self.keypool.release(apikey, cost)
+                raise
+            if response.status_code == 200:
+                self.quota_used += cost
+                return response
+            self.keypool.release(apikey, cost)
+            try:
+                reason = response.json()['error']['errors'][0]['reason']
+            except (ValueError, KeyError, IndexError):
+                reason = 'HTTP code {}'.format(response.status_code)
+            if not self.keypool.retire(apikey, reason):
+                print('Unable to use the Youtube API key.')
+                raise Exception(reason)
 
     def find_chinfo(self):
         """
@@ -227,22 +336,12 @@ class YoutubeHandlerAPI:
             # Check https://developers.google.com/youtube/v3/docs
             resource = 'search'
             parameters = {
-                'key': self.apikey,
                 'part': 'snippet',
                 'type': 'channel',
                 'maxResults': 1,
                 'q': self.channelname
             }
-            response = requests.get(self.apiurl + resource, params=parameters)
-            # Parse JSON for key status
-            if response.status_code != 200:
-                if response.json()['error']['errors'][0]['reason'] == 'keyInvalid':
-                    print('The Youtube API key is not valid. '
-                          'Review your credentials. Key provided: {}'.format(self.apikey))
-                    # Exit program if the API key is invalid because it's pointless to continue
-                    exit()
-                print('Unable to use the Youtube API key.')
-                raise Exception(response.json()['error']['errors'][0]['reason'])
+            response = self.request(resource, parameters)
             # Get channelId from json
             self.channelid = response.json()['items'][0]['snippet']['channelId']
             self.channellogo = response.json()['items'][0]['snippet']['thumbnails']['high']['url']
@@ -263,23 +362,13 @@ class YoutubeHandlerAPI:
             # If multiple streams, prioritize highest view count
             resource = 'search'
             parameters = {
-                'key': self.apikey,
                 'part': 'id,snippet',
                 'channelId': self.channelid,
                 'type': 'video',
                 'eventType': 'live',
                 'order': 'viewCount'
             }
-            response = requests.get(self.apiurl + resource, params=parameters)
-            # Parse JSON for key status
-            if response.status_code != 200:
-                if response.json()['error']['errors'][0]['reason'] == 'keyInvalid':
-                    print('The Youtube API key is invalid. '
-                          'Review your credentials. Key provided: {}'.format(self.apikey))
-                    # Exit program if the API key is invalid because it's pointless to continue
-                    exit()
-                print('Unable to use the Youtube API key.')
-                raise Exception(response.json()['error']['errors'][0]['reason'])
+            response = self.request(resource, parameters)
             # Check if there's a live-stream available. Raise exception otherwise.
             if not response.json()['items']:
                 print('Unable to find a live-stream on channel ID {}'.format(self.channelid))
@@ -294,7 +383,8 @@ class YoutubeHandlerAPI:
                 'id': response.json()['items'][0]['id']['videoId'],
                 'url': 'https://www.youtube.com/watch?v=' + response.json()['items'][0]['id']['videoId'],
                 'date': response.json()['items'][0]['snippet']['publishedAt'].encode('utf-8'),
-                'region': response.json()['regionCode'].encode('utf-8')
+                # the region is written to the m3u file, so it is kept as text
+                'region': response.json()['regionCode']
             }
             print('Done extracting info from the live-stream!')
             return video
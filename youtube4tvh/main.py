@@ -6,23 +6,50 @@
 #               Be mindful of the API daily quota.
 #               The author does not provide any sort warranty whatsoever.
 
-from lib.m3uhandler import M3uHandler
-from lib.youtubehandler import YoutubeHandlerAPI, YoutubeHandlerNoAPI
+# Heavy dependencies (pandas, requests) are imported by the handlers only on the code paths
+# that use them, so that --help and argument errors do not pay for them
 from argparse import ArgumentParser
+import time
 
 
 def cli():
     ap = ArgumentParser()
     ap.add_argument('--apikey',
                     type=str,
+                    nargs='+',
                     required=False,
                     help='your API KEY to use the Youtube API. '
-                         'see https://developers.google.com/youtube/v3/getting-started.')
+                         'see https://developers.google.com/youtube/v3/getting-started. '
+                         'multiple keys can be provided and requests are spread across them by remaining quota. '
+                         'keys that run out of quota or are invalid are not used until the daily reset.')
+    ap.add_argument('--apikeystate',
+                    type=str,
+                    required=False,
+                    help='for --apikey. the /path/to/state.json where the daily quota usage of each key is kept '
+                         'across runs (e.g., ~/.youtube4tvh_apikeys.json). '
+                         'if not provided, the usage is only tracked within a run.')
+    ap.add_argument('--apiquota',
+                    type=int,
+                    default=10000,
+                    required=False,
+                    help='for --apikey. the daily quota of each key. default is 10000.')
     ap.add_argument('--apiurl',
                     type=str,
                     default='https://www.googleapis.com/youtube/v3/',
                     required=False,
                     help='base URL of the Youtube API. default uses the Youtube API v3.')
+    ap.add_argument('--channeltimeout',
+                    required=False,
+                    type=float,
+                    help='the time budget of each channel, in seconds. requests of a channel are cut short to fit '
+                         'in its budget and the channel is skipped once the budget is exhausted. '
+                         'if not provided, channels are only bound by --connecttimeout and --readtimeout.')
+    ap.add_argument('--channellist',
+                    required=False,
+                    type=str,
+                    help='for --mode=add. the /path/to/channels.csv (or .json, .yaml) with a list of channels to add. '
+                         'each channel has a name and optionally an id, logo and group. '
+                         'all channels are resolved concurrently and written to the m3u file at once.')
     ap.add_argument('--channelid',
                     required=False,
                     type=str,
@@ -37,16 +64,51 @@ def cli():
                     required=False,
                     type=str,
                     help='REQUIRED for --mode=add. the NAME of the channel with a live-stream.')
+    ap.add_argument('--connecttimeout',
+                    required=False,
+                    default=10,
+                    type=float,
+                    help='the timeout to connect to a server on every request, in seconds. default is 10.')
+    ap.add_argument('--deadline',
+                    required=False,
+                    type=float,
+                    help='the time budget of the whole run, in seconds. once it passes, no new channel is resolved, '
+                         'the channels resolved so far are written and the skipped channels are reported.')
+    ap.add_argument('--logocache',
+                    required=False,
+                    type=str,
+                    help='the /path/to/cache/dir of channel logos. if provided, the logo of every channel added or '
+                         'updated is downloaded (or revalidated) into this dir and tvg-logo points to the local copy.')
+    ap.add_argument('--logosize',
+                    required=False,
+                    type=int,
+                    help='for --logocache. downscale logos to fit in a LOGOSIZE x LOGOSIZE box. requires Pillow.')
+    ap.add_argument('--logourl',
+                    required=False,
+                    type=str,
+                    help='for --logocache. the base URL that serves the logo cache dir (e.g., http://host:port/logos). '
+                         'if not provided, tvg-logo is the local path of the cached logo.')
     ap.add_argument('--m3uinput',
                     required=False,
                     type=str,
                     help='REQUIRED for --mode=update. the /path/to/input.m3u. '
                          'used to import data from an existing m3u file.')
+    ap.add_argument('--m3ugroup',
+                    required=False,
+                    type=str,
+                    help='for --registry. only write the channels with this group-title to the m3u file.')
     ap.add_argument('--m3uoutput',
                     required=False,
                     default='output.m3u',
                     type=str,
                     help='the /path/to/output.m3u. default is output.m3u.')
+    ap.add_argument('--manifestcache',
+                    required=False,
+                    type=str,
+                    help='the /path/to/cache/dir of pre-resolved HLS manifests. if provided, the HLS manifest of '
+                         'every live-stream found is saved there with its expiration time, so that the pipe script '
+                         'can skip resolving the stream at tune time. the pipe scripts read '
+                         '/opt/youtube4tvh/cache/manifests by default (see streamlink.sh).')
     ap.add_argument('--mode',
                     choices=['add', 'update'],
                     type=str,
@@ -62,96 +124,100 @@ def cli():
                     help='the command to pipe data to a player/server. '
                          'for TVH and streamlink, it is pipe:///path/to/bash /path/to/streamlink.sh, for example. '
                          'default is \'pipe:///bin/bash /opt/youtube4tvh/streamlink.sh\'.')
+    ap.add_argument('--readtimeout',
+                    required=False,
+                    default=30,
+                    type=float,
+                    help='the timeout to wait for data from a server on every request, in seconds. default is 30.')
+    ap.add_argument('--registry',
+                    required=False,
+                    type=str,
+                    help='the /path/to/registry.db of a SQLite channel registry. if provided, channels are read from '
+                         'and saved to the registry, which also keeps per-channel state (last resolved time and video, '
+                         'failures, quota cost), and the m3u file is generated from it. an empty registry is seeded '
+                         'from --m3uinput.')
+    ap.add_argument('--tvhnetwork',
+                    required=False,
+                    type=str,
+                    help='for --tvhurl. the name of the IPTV network of the m3u file in TVH. '
+                         'if not provided, muxes from any network are updated, but only when their current URL '
+                         'matches. if provided, muxes of this network are also matched by their name.')
+    ap.add_argument('--tvhpassword',
+                    required=False,
+                    type=str,
+                    help='for --tvhurl. the password of the TVH user.')
+    ap.add_argument('--tvhurl',
+                    required=False,
+                    type=str,
+                    help='the URL of a TVH server (e.g., http://localhost:9981). if provided, the muxes of the '
+                         'channels whose stream URL changed are updated through the TVH API, so that TVH does not '
+                         'have to rescan the whole playlist.')
+    ap.add_argument('--tvhuser',
+                    required=False,
+                    type=str,
+                    help='for --tvhurl. a TVH user with admin access (digest authentication).')
+    ap.add_argument('--workers',
+                    required=False,
+                    default=8,
+                    type=int,
+                    help='the number of channels resolved concurrently with --channellist or --mode=update. '
+                         'default is 8.')
     return vars(ap.parse_args())
 
 
-def add_stream():
-    # Create or append a live-stream to an m3u file
-    if not args_cli['channelname']:
+def add_streams():
+    # Create or append the live-streams of a list of channels (or of a single channel) to an m3u file
+    if args_cli['channellist']:
+        from lib.channellist import read_channels
+        print('[INFO] Reading the list of channels from {}...'.format(args_cli['channellist']))
+        channels = read_channels(args_cli['channellist'])
+        if not channels:
+            print('[WARNING] Unable to read channels from the list. Bye!')
+            exit()
+    elif args_cli['channelname']:
+        channels = [{'name': args_cli['channelname'],
+                     'id': args_cli['channelid'] or '',
+                     'logo': args_cli['channellogo'] or '',
+                     'group': ''}]
+    else:
         print('[INFO] A channel name must be provided at the very least. See --help.  Bye!')
         exit()
-    # YOUTUBE API HANDLER
-    if args_cli['apikey']:
-        youtube = YoutubeHandlerAPI(apiurl=args_cli['apiurl'],
-                                    apikey=args_cli['apikey'],
-                                    channelid=args_cli['channelid'],
-                                    channelname=args_cli['channelname'],
-                                    channellogo=args_cli['channellogo'])
-        print('[INFO] User entered a Youtube API key. Be mindful of your daily quota.')
-    elif not args_cli['apikey']:
-        youtube = YoutubeHandlerNoAPI(channelid=args_cli['channelid'],
-                                      channelname=args_cli['channelname'],
-                                      channellogo=args_cli['channellogo'])
-        print('[INFO] User did not enter a Youtube API key. Parsing data from YT website.')
-    # Extract channel info
-    if not args_cli['channelid']:
-        print('[INFO] Retrieving channel info using the NAME provided...')
-        args_cli['channelid'], args_cli['channellogo'] = youtube.find_chinfo()
-    print('[INFO] Retrieving info from the channel\'s live-stream...')
-    # Find info from the channel's live-stream
-    stream = youtube.find_stream()
-    if stream:
-        # M3U HANDLER
-        m3u = M3uHandler(args_cli['m3uinput'],
-                         args_cli['m3uoutput'])
-        m3u_parameters = {
-            'channelid': args_cli['channelid'],
-            'channelname': args_cli['channelname'],
-            'channelcountry': stream['region'],
-            'channellogo': args_cli['channellogo'],
-            'pipecmd': args_cli['pipecmd'],
-            'url': stream['url']
-        }
-        # Parse existing input m3u file
-        m3u_df = []
-        if args_cli['m3uinput']:
-            print('[INFO] User provided an input M3U playlist at {}.  '
-                  'Will try to parse it and create a data frame...'.format(args_cli['m3uinput']))
-            m3u_df = m3u.parse()
-            if m3u_df is None:
-                print('[INFO] Generating an empty data frame...')
-                m3u_df = m3u.template()
-        # Else, create a template data frame
-        elif not args_cli['m3uinput']:
-            print('[INFO] Did not find an input M3U playlist. Generating an empty data frame...')
-            m3u_df = m3u.template()
-        # Append or update data frame
-        write_df = True
-        if m3u_df.empty:
-            print('[INFO] Appending stream info to the data frame...')
-            m3u_df = m3u.append(m3u_df, **m3u_parameters)
-        elif not m3u_df.empty:
-            # Check if the channel id exists in the data frame
-            chbool = m3u.search(m3u_df, 'tvg-id', args_cli['channelid'])
-            if chbool:
-                print('[INFO] Found the same channel on {}. '
-                      'Updating its url in the data frame...'.format(args_cli['m3uinput']))
-                m3u_df = m3u.update(m3u_df, **m3u_parameters)
-            elif not chbool:
-                print('[INFO] Did not find the same channel on {}.'.format(args_cli['m3uinput']))
-                if args_cli['mode'] == 'add':
-                    print('[INFO] Will append the stream info to the data frame...')
-                    m3u_df = m3u.append(m3u_df, **m3u_parameters)
-                elif args_cli['mode'] == 'update':
-                    print('[WARNING] Will not write anything to the data frame because mode is update.')
-                    write_df = False
-        # Consolidate m3u data frame to a .m3u file
-        if write_df:
-            print('[INFO] Writing data frame to .m3u file...')
-            m3u.write(m3u_df)
-        print('[INFO] Done!')
-    if not stream:
-        print('[WARNING] Unable to retrieve data from channel \'{}\'.'.format(args_cli['channelname']))
+    # M3U HANDLER
+    from lib.m3uhandler import M3uHandler
+    m3u = M3uHandler(args_cli['m3uinput'],
+                     args_cli['m3uoutput'])
+    if registry:
+        seed_registry(m3u)
+        merge_streams(m3u, None, channels)
+        return
+    m3u_df = None
+    if args_cli['m3uinput']:
+        print('[INFO] User provided an input M3U playlist at {}.  '
+              'Will try to parse it and create a data frame...'.format(args_cli['m3uinput']))
+        m3u_df = m3u.parse()
+    if m3u_df is None:
+        print('[INFO] Generating an empty data frame...')
+        m3u_df = m3u.template()
+    merge_streams(m3u, m3u_df, channels)
 
 
 def update_stream():
     # Update stream from a file
-    if not args_cli['m3uinput']:
+    if not args_cli['m3uinput'] and not registry:
         print('[WARNING] An input m3u file is required to use this program in update mode. See --help.  Bye!')
         exit()
     # M3U HANDLER
+    from lib.m3uhandler import M3uHandler
     m3u = M3uHandler(args_cli['m3uinput'],
                      args_cli['m3uoutput'])
+    if registry:
+        seed_registry(m3u)
+        names = registry.names()
+        if not names:
+            print('[WARNING] The registry is empty. Unable to continue in update mode. Bye!')
+            exit()
+        merge_streams(m3u, None, [{'name': name, 'id': '', 'logo': '', 'group': ''} for name in names])
+        return
     # Parse user provided m3u file
     print('[INFO] User provided an input M3U playlist at {}.  '
           'Will try to parse it and create a data frame...'.format(args_cli['m3uinput']))
@@ -161,33 +227,237 @@ def update_stream():
         print('[WARNING] The data frame is empty. Unable to continue in update mode. Bye!')
         exit()
     names = m3u.extract_column(m3u_df, 'channel-name')
-    if names is None:
+    if not names:
         print('[WARNING] The list of channels is empty. Unable to continue in update mode. Bye!')
         exit()
-    for channel in names:
-        print('##############################################')
-        print('[INFO] Updating channel: {}...'.format(channel))
-        print('##############################################')
-        args_cli['channelname'], args_cli['channelid'], args_cli['channellogo'] = channel, '', ''
-        # TODO: improve the way errors are handled (e.g., try with /channelid/live)
-        try:
-            add_stream()
-        except Exception:
-            print('[WARNING] Error updating info from channel \'{}\''.format(channel))
-            continue
+    # Channels are looked up by name, so that moved live-streams are found again
+    channels = [{'name': name, 'id': '', 'logo': '', 'group': ''} for name in names]
+    merge_streams(m3u, m3u_df, channels)
+
+
+def timeouts(deadline=None):
+    # The (connect, read) timeouts of a request, cut short to the time left before the deadline
+    connect, read = args_cli['connecttimeout'], args_cli['readtimeout']
+    if deadline is None:
+        return connect, read
+    left = deadline - time.time()
+    if left <= 0:
+        raise Exception('ran out of time')
+    return min(connect, left), min(read, left)
+
+
+def resolve_stream(channel):
+    # Find the live-stream of a channel from a channel list.
+    # Returns its m3u parameters, None if unable to retrieve data from the channel
+    # or False if the channel was skipped because the run deadline passed.
+    if run_deadline and time.time() >= run_deadline:
+        print('[WARNING] Skipping channel \'{}\' because the run deadline passed.'.format(channel['name']))
+        return False
+    print('[INFO] Resolving channel: {}...'.format(channel['name']))
+    # The channel must be done before its own time budget and the run deadline, whichever comes first
+    deadlines = [run_deadline]
+    if args_cli['channeltimeout']:
+        deadlines.append(time.time() + args_cli['channeltimeout'])
+    deadline = min([d for d in deadlines if d] or [None])
+    try:
+        # YOUTUBE API HANDLER
+        from lib.youtubehandler import YoutubeHandlerAPI, YoutubeHandlerNoAPI
+        if args_cli['apikey']:
+            youtube = YoutubeHandlerAPI(apiurl=args_cli['apiurl'],
+                                        apikey=keys,
+                                        channelid=channel['id'],
+                                        channelname=channel['name'],
+                                        channellogo=channel['logo'],
+                                        timeout=timeouts(),
+                                        deadline=deadline)
+        else:
+            youtube = YoutubeHandlerNoAPI(channelid=channel['id'],
+                                          channelname=channel['name'],
+                                          channellogo=channel['logo'],
+                                          timeout=timeouts(deadline))
+        channelid, channellogo = channel['id'], channel['logo']
+        if not channelid:
+            channelid, channellogo = youtube.find_chinfo()
+            if not channelid:
+                raise Exception('unable to find the channel id')
+        if not args_cli['apikey']:
+            # the API handler cuts each of its requests to the deadline itself
+            youtube.timeout = timeouts(deadline)
+        stream = youtube.find_stream()
+        if not isinstance(stream, dict):
+            raise Exception('unable to find a live-stream')
+        cache_manifest(stream['id'], deadline)
+        return {
+            'channelid': channelid,
+            'channelname': channel['name'],
+            'channelcountry': stream['region'],
+            'channellogo': cache_logo(channellogo, deadline),
+            'channelgroup': channel['group'],
+            'pipecmd': args_cli['pipecmd'],
+            'url': stream['url'],
+            'videoid': stream['id'],
+            'quotacost': getattr(youtube, 'quota_used', 0)
+        }
+    except Exception as err:
+        print('[WARNING] Error updating info from channel \'{}\': {}'.format(channel['name'], err))
+        return None
+
+
+def seed_registry(m3u):
+    # Import the input m3u file into the registry, if the registry is empty
+    if registry.count() or not args_cli['m3uinput']:
+        return
+    print('[INFO] The registry is empty. Will try to import the M3U playlist at {}...'.format(args_cli['m3uinput']))
+    m3u_df = m3u.parse()
+    if m3u_df is not None:
+        registry.import_dataframe(m3u_df)
+
+
+def changed_urls(changes):
+    # List of (channel name, old url, new url) from a data frame of M3uHandler.changes()
+    return list(zip(changes['channel-name'], changes['stream-url-old'], changes['stream-url-new']))
+
+
+def notify_tvh(changes):
+    # Update the muxes of the channels whose stream url changed in TVH, if enabled
+    if not args_cli['tvhurl']:
+        return
+    print('[INFO] The stream URL of {} channel(s) changed.'.format(len(changes)))
+    if not changes:
+        return
+    from lib.tvhhandler import TvhHandler
+    tvh = TvhHandler(args_cli['tvhurl'],
+                     username=args_cli['tvhuser'],
+                     password=args_cli['tvhpassword'],
+                     network=args_cli['tvhnetwork'],
+                     timeout=timeouts())
+    tvh.update_urls(changes)
+
+
+def cache_logo(url, deadline=None):
+    # Return the location of the cached logo at url, if the logo cache is enabled
+    if not logos:
+        return url
+    try:
+        timeout = timeouts(deadline)
+    except Exception:
+        print('[WARNING] Not revalidating the logo {} because the channel ran out of time.'.format(url))
+        return logos.cached(url)
+    return logos.fetch(url, timeout=timeout)
+
+
+def cache_manifest(videoid, deadline=None):
+    # Pre-resolve the HLS manifest of a live-stream into the manifest cache, if enabled
+    if not args_cli['manifestcache']:
+        return
+    try:
+        timeout = timeouts(deadline)
+    except Exception:
+        print('[WARNING] Not caching the HLS manifest of \'{}\' because the channel ran out of time.'.format(videoid))
+        return
+    from lib.manifestcache import ManifestCache
+    from lib.youtubehandler import YoutubeHandlerNoAPI
+    # The watch page is parsed without the API, so this does not use any quota
+    manifest = YoutubeHandlerNoAPI(channelid=None,
+                                   channelname=None,
+                                   channellogo=None,
+                                   timeout=timeout).find_manifest(videoid)
+    if manifest:
+        ManifestCache(args_cli['manifestcache']).save(videoid, manifest)
+
+
+def merge_streams(m3u, m3u_df, channels):
+    # Resolve the live-streams of all channels concurrently and write them to the m3u file at once
+    from concurrent.futures import ThreadPoolExecutor
+    print('[INFO] Resolving {} channel(s) with {} workers...'.format(len(channels), args_cli['workers']))
+    with ThreadPoolExecutor(max_workers=max(1, args_cli['workers'])) as executor:
+        streams = list(executor.map(resolve_stream, channels))
+    failed = [channel['name'] for channel, stream in zip(channels, streams) if stream is None]
+    skipped = [channel['name'] for channel, stream in zip(channels, streams) if stream is False]
+    streams = [stream for stream in streams if stream]
+    if failed:
+        print('[WARNING] Unable to retrieve data from {} channel(s): {}'.format(len(failed), ', '.join(failed)))
+    if skipped:
+        print('[WARNING] Skipped {} channel(s) because the run deadline passed: {}'.format(len(skipped),
+                                                                                          ', '.join(skipped)))
+    if registry:
+        registry.record_failures(failed)
+    if not streams:
+        print('[WARNING] Will not write anything because no live-stream was found.')
+        return
+    if registry:
+        # In update mode, channels that are not in the registry are not added
+        changes = registry.save(streams, append_new=args_cli['mode'] == 'add')
+        print('[INFO] Writing the registry to .m3u file...')
+        # TVH is only told about the new urls once they are in the m3u file
+        if m3u.write_stream(registry.entries(group=args_cli['m3ugroup'])):
+            notify_tvh(changes)
+        print('[INFO] Done!')
+        return
+    # In update mode, channels that are not in the m3u file are not appended
+    old_df, m3u_df = m3u_df, m3u.merge(m3u_df, streams, append_new=args_cli['mode'] == 'add')
+    if m3u_df is None:
+        print('[WARNING] Will not write anything because the data frame could not be merged.')
+        return
+    print('[INFO] Writing data frame to .m3u file...')
+    if m3u.write(m3u_df):
+        notify_tvh(changed_urls(m3u.changes(old_df, m3u_df)))
+    print('[INFO] Done!')
 
 
 def main():
+    global keys, logos, registry, run_deadline
+    if args_cli['deadline']:
+        run_deadline = time.time() + args_cli['deadline']
     print('##############################################')
     print('[INFO] Running Youtube4TVH in \'{}\' mode.'.format(args_cli['mode']))
     print('##############################################')
-    add_stream() if args_cli['mode'] == 'add' else update_stream()
+    if args_cli['registry']:
+        from lib.registry import Registry
+        registry = Registry(args_cli['registry'])
+        print('[INFO] Using the channel registry at {} with {} channel(s).'.format(args_cli['registry'],
+                                                                                  registry.count()))
+    if args_cli['apikey']:
+        from lib.keypool import KeyPool
+        keys = KeyPool(args_cli['apikey'], statefile=args_cli['apikeystate'], quota=args_cli['apiquota'])
+        print('[INFO] Using {} Youtube API key(s) with {} quota units left today.'.format(len(keys.apikeys),
+                                                                                       keys.remaining()))
+    if args_cli['logocache']:
+        from lib.logocache import LogoCache
+        logos = LogoCache(args_cli['logocache'],
+                          baseurl=args_cli['logourl'],
+                          size=args_cli['logosize'],
+                          timeout=timeouts())
+    try:
+        if args_cli['mode'] == 'add':
+            add_streams()
+        else:
+            update_stream()
+        if args_cli['manifestcache']:
+            from lib.manifestcache import ManifestCache
+            ManifestCache(args_cli['manifestcache']).prune()
+    finally:
+        # the quota spent and the logos cached so far are kept even if the run fails
+        if logos:
+            logos.save()
+        if keys:
+            keys.save()
+            print('[INFO] {} Youtube API quota units left today.'.format(keys.remaining()))
+        if registry:
+            registry.close()
     print('##############################################')
     print('[INFO] We are all done here. Bye!')
     print('##############################################')
     exit()
 
 
+# API KEY POOL, LOGO CACHE and REGISTRY, shared by all channels of a run
+keys = None
+logos = None
+registry = None
+# Time (unix) after which no new channel is resolved
+run_deadline = None
+
 if __name__ == '__main__':
     args_cli = cli()
     main()
@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+# Purpose:      Share one upstream fetch of a Youtube live-stream among many TVH subscribers
+# Author:       cgomesu
+# Disclaimer:   Use at your own discretion.
+#               The author does not provide any sort warranty whatsoever.
+
+from lib.streamrelay import StreamRelay
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+
+def cli():
+    ap = ArgumentParser()
+    ap.add_argument('--buffersize',
+                    required=False,
+                    default=256,
+                    type=int,
+                    help='the number of chunks (64 KiB each) kept in the ring buffer of each channel. '
+                         'subscribers that fall further behind skip ahead. default is 256.')
+    ap.add_argument('--grace',
+                    required=False,
+                    default=30,
+                    type=int,
+                    help='the number of seconds an upstream without subscribers is kept alive. default is 30.')
+    ap.add_argument('--host',
+                    required=False,
+                    default='127.0.0.1',
+                    type=str,
+                    help='the address the relay listens on. default is 127.0.0.1.')
+    ap.add_argument('--port',
+                    required=False,
+                    default=9110,
+                    type=int,
+                    help='the port the relay listens on. default is 9110.')
+    ap.add_argument('--upstreamcmd',
+                    required=False,
+                    default='/bin/bash /opt/youtube4tvh/streamlink.sh',
+                    type=str,
+                    help='the command that writes the MPEG-TS stream of a URL to stdout. the URL is appended to it. '
+                         'default is \'/bin/bash /opt/youtube4tvh/streamlink.sh\'.')
+    return vars(ap.parse_args())
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class RelayHandler(BaseHTTPRequestHandler):
+    """
+    Serves GET /stream?url=URL with the shared stream of URL (see relay.sh)
+    """
+    relay = None
+
+    def do_GET(self):
+        request = urlparse(self.path)
+        url = parse_qs(request.query).get('url', [''])[0]
+        if request.path != '/stream' or not url.startswith(('https://', 'http://')):
+            self.send_error(404, 'Use /stream?url=URL')
+            return
+        try:
+            subscription = self.relay.subscribe(url)
+        except (IOError, OSError) as err:
+            self.send_error(502, 'Could not start the upstream: {}'.format(err))
+            return
+        try:
+            stream = iter(subscription)
+            # wait for the first data before sending headers, so a failing upstream is an error, not an empty stream
+            data = next(stream, None)
+            if data is None:
+                self.send_error(502, 'The upstream ended without any data')
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'video/mp2t')
+            self.end_headers()
+            self.wfile.write(data)
+            for data in stream:
+                self.wfile.write(data)
+        except (IOError, OSError):
+            # the subscriber went away
+            pass
+        finally:
+            subscription.close()
+
+
+def main():
+    print('##############################################')
+    print('[INFO] Running Youtube4TVH relay on {}:{}.'.format(args_cli['host'], args_cli['port']))
+    print('##############################################')
+    RelayHandler.relay = StreamRelay(upstreamcmd=args_cli['upstreamcmd'],
+                                     buffersize=args_cli['buffersize'],
+                                     grace=args_cli['grace'])
+    RelayHandler.relay.run_reaper()
+    server = ThreadingHTTPServer((args_cli['host'], args_cli['port']), RelayHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        RelayHandler.relay.stop()
+    print('##############################################')
+    print('[INFO] We are all done here. Bye!')
+    print('##############################################')
+
+
+if __name__ == '__main__':
+    args_cli = cli()
+    main()
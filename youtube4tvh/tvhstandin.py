@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+# Purpose:      A local stand-in for the TVH API used by Youtube4TVH (--tvhurl)
+# Author:       cgomesu
+# Disclaimer:   Use at your own discretion.
+#               The author does not provide any sort warranty whatsoever.
+
+import json
+import threading
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# IPTV muxes of the stand-in server, as returned by api/mpegts/mux/grid
+MUXES = [
+    {'uuid': 'mux-url', 'network': 'Youtube', 'iptv_muxname': 'Record News',
+     'iptv_url': 'pipe:///bin/bash /opt/youtube4tvh/streamlink.sh https://www.youtube.com/watch?v=old1'},
+    {'uuid': 'mux-name', 'network': 'Youtube', 'iptv_muxname': 'Todo Noticias',
+     'iptv_url': 'pipe:///bin/bash /opt/youtube4tvh/streamlink.sh https://www.youtube.com/watch?v=moved'},
+    {'uuid': 'mux-other', 'network': 'Other', 'iptv_muxname': 'Other News',
+     'iptv_url': 'pipe:///bin/bash /opt/youtube4tvh/streamlink.sh https://www.youtube.com/watch?v=old3'},
+    {'uuid': 'mux-twin1', 'network': 'Youtube', 'iptv_muxname': 'Twin News',
+     'iptv_url': 'pipe:///bin/bash /opt/youtube4tvh/streamlink.sh https://www.youtube.com/watch?v=twin1'},
+    {'uuid': 'mux-twin2', 'network': 'Youtube', 'iptv_muxname': 'Twin News',
+     'iptv_url': 'pipe:///bin/bash /opt/youtube4tvh/streamlink.sh https://www.youtube.com/watch?v=twin2'},
+    {'uuid': 'dvb-mux', 'network': 'DVB-T', 'frequency': 545000000},
+]
+
+
+def cli():
+    ap = ArgumentParser()
+    ap.add_argument('--mode',
+                    choices=['check', 'serve'],
+                    type=str,
+                    default='check',
+                    required=False,
+                    help='mode=check runs the stand-in on a free port and checks the mux updates of the TVH handler '
+                         'against it, exiting with an error on failure (default). '
+                         'mode=serve runs the stand-in until interrupted and prints every save request, '
+                         'for use with main.py --tvhurl.')
+    ap.add_argument('--port',
+                    required=False,
+                    default=9981,
+                    type=int,
+                    help='for --mode=serve. the port the stand-in listens on. default is 9981.')
+    return vars(ap.parse_args())
+
+
+class TvhStandIn(BaseHTTPRequestHandler):
+    """
+    Serves the muxes of MUXES on GET api/mpegts/mux/grid and records the nodes of POST api/idnode/save
+    """
+    saved = []
+
+    def reply(self, code, body):
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode('utf-8'))
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/api/mpegts/mux/grid':
+            self.reply(404, {})
+            return
+        self.reply(200, {'entries': MUXES, 'total': len(MUXES)})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/api/idnode/save':
+            self.reply(404, {})
+            return
+        form = parse_qs(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'))
+        nodes = json.loads(form['node'][0])
+        self.saved.append(nodes)
+        print('[INFO] Saved node(s): {}'.format(json.dumps(nodes)))
+        self.reply(200, {})
+
+    def log_message(self, *args):
+        pass
+
+
+def check():
+    # Update the muxes of the stand-in through the TVH handler and compare the saved nodes to the expected ones
+    from lib.tvhhandler import TvhHandler
+    server = HTTPServer(('127.0.0.1', 0), TvhStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    tvhurl = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    new = 'pipe:///bin/bash /opt/youtube4tvh/streamlink.sh https://www.youtube.com/watch?v=new{}'
+    changes = [('Renamed News', MUXES[0]['iptv_url'], new.format(1)),  # matched by its old url
+               ('Todo Noticias', 'not in TVH', new.format(2)),         # matched by its name, within a network
+               ('Other News', MUXES[2]['iptv_url'], new.format(3)),    # in another network
+               ('Twin News', 'not in TVH', new.format(4)),             # more than one mux with its name
+               ('Missing News', 'not in TVH', new.format(5))]          # not in TVH
+    cases = [
+        ('all networks', None, 2, [{'uuid': 'mux-url', 'iptv_url': new.format(1)},
+                                   {'uuid': 'mux-other', 'iptv_url': new.format(3)}]),
+        ('--tvhnetwork', 'Youtube', 2, [{'uuid': 'mux-url', 'iptv_url': new.format(1)},
+                                        {'uuid': 'mux-name', 'iptv_url': new.format(2)}]),
+        ('no match', 'DVB-T', 0, None),
+    ]
+    failed = 0
+    try:
+        for name, network, updated, nodes in cases:
+            del TvhStandIn.saved[:]
+            result = TvhHandler(tvhurl, network=network).update_urls(changes)
+            saved = TvhStandIn.saved[0] if TvhStandIn.saved else None
+            ok = result == updated and saved == nodes and len(TvhStandIn.saved) <= 1
+            failed += not ok
+            print('[{}] {}: updated={} saved={}'.format('OK' if ok else 'FAILED', name, result,
+                                                        [node['uuid'] for node in saved or []]))
+    finally:
+        server.shutdown()
+        server.server_close()
+    if failed:
+        print('[WARNING] {} check(s) of the TVH handler failed.'.format(failed))
+        exit(1)
+    print('[INFO] The TVH handler updated the expected muxes.')
+
+
+def serve():
+    server = HTTPServer(('127.0.0.1', args_cli['port']), TvhStandIn)
+    print('[INFO] Use --tvhurl=http://127.0.0.1:{} with main.py.'.format(args_cli['port']))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    print('##############################################')
+    print('[INFO] Running the TVH stand-in in \'{}\' mode.'.format(args_cli['mode']))
+    print('##############################################')
+    check() if args_cli['mode'] == 'check' else serve()
+
+
+if __name__ == '__main__':
+    args_cli = cli()
+    main()